@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import Person, PersonGroup, ChangeSet, PersonHistory
+from .models import Person, PersonGroup, ChangeSet, PersonHistory, GroupVitrine
+from .checkpoint_service import CheckpointService
+from .vitrine import VitrineService
+from .services import PersonService
 
 
 @admin.register(PersonGroup)
@@ -38,6 +41,26 @@ class PersonAdmin(admin.ModelAdmin):
         }),
     )
 
+    # Правки через админку минуют запись версии, витрину пересчитываем сами
+    def save_model(self, request, obj, form, change):
+        old_group_id = Person.objects.filter(pk=obj.pk).values_list('group_id', flat=True).first() if change else None
+        super().save_model(request, obj, form, change)
+        VitrineService.refresh_groups([obj.group_id, old_group_id])
+        # created_at в админке редактируется — версия может оказаться раньше контрольной точки
+        CheckpointService.invalidate()
+        PersonService.invalidate_search_cache()
+
+    def delete_model(self, request, obj):
+        self.delete_queryset(request, Person.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        group_ids = list(queryset.values_list('group_id', flat=True))
+        GroupVitrine.objects.filter(person__in=queryset).delete()
+        super().delete_queryset(request, queryset)
+        VitrineService.refresh_groups(group_ids)
+        CheckpointService.invalidate()
+        PersonService.invalidate_search_cache()
+
 
 @admin.register(PersonHistory)
 class PersonHistoryAdmin(admin.ModelAdmin):
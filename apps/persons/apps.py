@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class PersonsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.persons'
+
+    def ready(self):
+        from . import lookups  # noqa: F401 — регистрация trgm_contains
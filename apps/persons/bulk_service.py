@@ -0,0 +1,223 @@
+import csv
+import json
+import time
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+from typing import Iterable, Iterator, List, Dict, Any, Optional, Tuple, Callable
+
+from .models import Person, PersonGroup, PersonHistory
+from .serializers import PersonSerializer
+from .services import PersonService
+from .dedup_index import get_dedup_index
+from .vitrine import VitrineService
+
+
+# Необязательные поля: пустая ячейка CSV означает NULL, а не пустую строку
+OPTIONAL_FIELDS = ('middle_name', 'phone', 'email')
+
+
+class BulkImportService:
+    """Сервис массовой загрузки людей пачками с дедупликацией"""
+
+    DEFAULT_BATCH_SIZE = 1000
+    MAX_REPORTED_ERRORS = 1000
+
+    @staticmethod
+    def iter_csv_rows(lines: Iterable[str]) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Чтение строк CSV с заголовком. Возвращает пары (номер строки, данные)."""
+        reader = csv.DictReader(lines)
+        for row_no, row in enumerate(reader, start=1):
+            data = {key.strip(): value for key, value in row.items() if key}
+            for field in OPTIONAL_FIELDS:
+                if data.get(field) == '':
+                    data[field] = None
+            yield row_no, data
+
+    @staticmethod
+    def iter_jsonl_rows(lines: Iterable[str]) -> Iterator[Tuple[int, Any]]:
+        """Чтение JSONL (один JSON-объект на строку). Пустые строки пропускаются."""
+        for row_no, line in enumerate(lines, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield row_no, json.loads(line)
+            except ValueError as e:
+                yield row_no, ValueError(f'Invalid JSON: {e}')
+
+    @staticmethod
+    def import_rows(
+        rows: Iterable[Tuple[int, Any]],
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        author: str = 'system',
+        reason: str = 'Bulk person import',
+        progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> Dict[str, Any]:
+        """Загрузка потока строк пачками по batch_size.
+
+        Каждая пачка валидируется, дедуплицируется и записывается в одной транзакции
+        под одним набором изменений. Возвращает отчёт с ошибками по строкам и скоростью.
+        """
+        report = BulkImportService.new_report()
+        started = time.monotonic()
+
+        batch = []
+        for row_no, data in rows:
+            batch.append((row_no, data))
+            if len(batch) >= batch_size:
+                BulkImportService._import_batch(batch, author, reason, report)
+                batch = []
+                if progress:
+                    progress(BulkImportService._with_speed(report, started))
+        if batch:
+            BulkImportService._import_batch(batch, author, reason, report)
+            if progress:
+                progress(BulkImportService._with_speed(report, started))
+
+        return BulkImportService._with_speed(report, started)
+
+    @staticmethod
+    def new_report() -> Dict[str, Any]:
+        return {
+            'total': 0,
+            'created': 0,
+            'failed': 0,
+            'batches': 0,
+            'errors': [],
+        }
+
+    @staticmethod
+    def _with_speed(report: Dict[str, Any], started: float) -> Dict[str, Any]:
+        elapsed = time.monotonic() - started
+        report['elapsed_seconds'] = round(elapsed, 3)
+        report['rows_per_sec'] = round(report['total'] / elapsed, 1) if elapsed > 0 else None
+        return report
+
+    @staticmethod
+    def _add_error(report: Dict[str, Any], row_no: int, errors: Any):
+        report['failed'] += 1
+        if len(report['errors']) < BulkImportService.MAX_REPORTED_ERRORS:
+            report['errors'].append({'row': row_no, 'errors': errors})
+
+    @staticmethod
+    def validate_row(row_no: int, data: Any, report: Dict[str, Any]) -> Optional[Tuple[Dict[str, Any], Person]]:
+        """Валидация строки теми же правилами, что и одиночное создание"""
+        if isinstance(data, Exception):
+            BulkImportService._add_error(report, row_no, str(data))
+            return None
+        if not isinstance(data, dict):
+            BulkImportService._add_error(report, row_no, 'Row must be a JSON object')
+            return None
+
+        serializer = PersonSerializer(data=data)
+        if not serializer.is_valid():
+            BulkImportService._add_error(report, row_no, serializer.errors)
+            return None
+
+        validated = dict(serializer.validated_data)
+        person = Person(is_current=True, **validated)
+        try:
+            person.clean()
+        except ValidationError as e:
+            BulkImportService._add_error(report, row_no, e.message_dict)
+            return None
+        # bulk_create не вызывает save(), ключи контактов заполняем сами
+        person.fill_search_keys()
+        return validated, person
+
+    @staticmethod
+    def _import_batch(batch: List[Tuple[int, Any]], author: str, reason: str, report: Dict[str, Any]):
+        report['total'] += len(batch)
+        report['batches'] += 1
+
+        valid = []
+        for row_no, data in batch:
+            result = BulkImportService.validate_row(row_no, data, report)
+            if result:
+                valid.append((row_no,) + result)
+        if not valid:
+            return
+
+        try:
+            with transaction.atomic():
+                persons = BulkImportService.write_batch(valid, author, reason)
+            report['created'] += len(persons)
+        except Exception:
+            # Ошибка всей пачки: записываем строки по одной, чтобы изолировать виновную
+            for row in valid:
+                try:
+                    with transaction.atomic():
+                        BulkImportService.write_batch([row], author, reason)
+                    report['created'] += 1
+                except Exception as e:
+                    BulkImportService._add_error(report, row[0], str(e))
+
+    @staticmethod
+    def write_batch(valid: List[tuple], author: str, reason: str) -> List[Person]:
+        """Запись пачки: один набор изменений, многострочные вставки групп, людей и истории.
+
+        valid — тройки (номер строки, validated_data, Person) от validate_row.
+        Возвращает созданных людей в порядке пачки.
+        """
+        change_set = PersonService.create_change_set(author=author, reason=reason)
+
+        # Поиск групп по данным до нормализации — как в create_person
+        rows = [validated for _, validated, _ in valid]
+        if settings.PERSONS_DEDUP_LOCKING:
+            PersonService.lock_blocking_keys(rows)
+        resolved, merges = PersonService.resolve_groups(rows)
+        for target_id, group_ids in merges.items():
+            PersonService.merge_groups(target_id, group_ids, change_set)
+
+        new_count = -min(resolved + [0])
+        new_ids = [g.id for g in PersonGroup.objects.bulk_create([PersonGroup() for _ in range(new_count)])]
+        group_ids = [gid if gid > 0 else new_ids[-gid - 1] for gid in resolved]
+
+        # Последняя версия в каждой существующей группе закрывается в истории
+        existing = {gid for gid in resolved if gid > 0}
+        latest = {
+            p.group_id: p
+            for p in Person.objects
+            .filter(group_id__in=existing)
+            .order_by('group_id', '-created_at', '-id')
+            .distinct('group_id')
+        }
+
+        persons = []
+        history = []
+        for (_, _, person), group_id in zip(valid, group_ids):
+            now_ts = timezone.now()
+            person.group_id = group_id
+            person.change = change_set
+            person.created_at = now_ts
+            prev = latest.get(group_id)
+            if prev:
+                history.append(PersonHistory(
+                    group_id=group_id,
+                    change=change_set,
+                    last_name=prev.last_name,
+                    first_name=prev.first_name,
+                    middle_name=prev.middle_name,
+                    birth_date=prev.birth_date,
+                    gender=prev.gender,
+                    address=prev.address,
+                    phone=prev.phone,
+                    email=prev.email,
+                    valid_from=prev.created_at,
+                    valid_to=now_ts,
+                ))
+            latest[group_id] = person
+            persons.append(person)
+
+        Person.objects.bulk_create(persons)
+        PersonHistory.objects.bulk_create(history)
+        VitrineService.refresh_change(change_set.id)
+
+        index = get_dedup_index()
+        if index is not None:
+            transaction.on_commit(lambda: [index.add_person(p) for p in persons])
+        # Последним запросом пачки
+        PersonService.invalidate_search_cache()
+        return persons
@@ -0,0 +1,152 @@
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from typing import List, Optional, Tuple
+
+from .models import ChangeSet, StateCheckpoint
+
+# Поля версии человека, которые хранит контрольная точка (и отдают запросы «на момент времени»)
+VERSION_FIELDS = ('last_name', 'first_name', 'middle_name', 'birth_date', 'gender', 'address', 'phone', 'email')
+
+
+class CheckpointService:
+    """Контрольные точки состояния: последняя версия каждой группы в person на момент taken_at.
+
+    Запрос «на момент T» берёт ближайшую точку не позже T и досматривает только версии
+    person с created_at в (taken_at, T] — стоимость зависит от числа изменений после точки,
+    а не от длины всей истории. Старые id слитых групп в строках точки разрешаются через
+    person_group_alias при чтении; передедупликация и правки в админке, переписывающие
+    прошлые версии, помечают точки устаревшими (invalidate).
+    """
+
+    @staticmethod
+    def nearest(timestamp: datetime) -> Optional[Tuple[int, datetime]]:
+        """(id, taken_at) последней действующей точки не позже timestamp"""
+        return (
+            StateCheckpoint.objects
+            .filter(invalidated_at__isnull=True, taken_at__lte=timestamp)
+            .order_by('-taken_at', '-id')
+            .values_list('id', 'taken_at')
+            .first()
+        )
+
+    @staticmethod
+    def person_versions_sql(timestamp: datetime, group_ids: Optional[List[int]] = None,
+                            groups_sql: str = None) -> Tuple[str, list]:
+        """Кандидаты «версия группы в person на момент timestamp»: (group_id, поля, version_at, id).
+
+        Без точки — все версии с created_at <= timestamp; с точкой — её строки плюс
+        версии после неё. Последнюю версию на группу выбирает вызывающий (DISTINCT ON).
+        Группы задаются списком group_ids или SQL-выражением int[] без параметров (groups_sql).
+        """
+        columns = ', '.join(VERSION_FIELDS)
+        group_params = []
+        if groups_sql is None and group_ids is not None:
+            groups_sql, group_params = '%s::int[]', [group_ids]
+        group_filter = f'AND group_id = ANY({groups_sql})' if groups_sql is not None else ''
+        checkpoint = CheckpointService.nearest(timestamp)
+        if checkpoint is None:
+            sql = f"""
+                SELECT group_id, {columns}, created_at AS version_at, id
+                FROM person
+                WHERE created_at <= %s {group_filter}
+            """
+            return sql, [timestamp] + group_params
+
+        checkpoint_id, taken_at = checkpoint
+        # Строки точки отбираются по своему (возможно, старому) group_id — по первичному ключу
+        # (checkpoint_id, group_id): запрошенные группы и все слитые в них
+        checkpoint_filter = ''
+        if groups_sql is not None:
+            checkpoint_filter = (
+                f'AND c.group_id = ANY({groups_sql} || ARRAY('
+                f'SELECT group_id FROM person_group_alias WHERE target_id = ANY({groups_sql})))'
+            )
+        sql = f"""
+            SELECT group_id, {columns}, created_at AS version_at, id
+            FROM person
+            WHERE created_at > %s AND created_at <= %s {group_filter}
+            UNION ALL
+            SELECT * FROM (
+                SELECT COALESCE(a.target_id, c.group_id) AS group_id,
+                       {', '.join('c.' + c for c in VERSION_FIELDS)}, c.version_at, c.person_id AS id
+                FROM state_checkpoint_row c
+                LEFT JOIN person_group_alias a ON a.group_id = c.group_id
+                WHERE c.checkpoint_id = %s {checkpoint_filter}
+            ) cp
+            WHERE TRUE {group_filter}
+        """
+        params = [taken_at, timestamp] + group_params + [checkpoint_id] + group_params * 3
+        return sql, params
+
+    @staticmethod
+    def create(change_id: int = None, every: int = None, lag: float = None) -> Optional[StateCheckpoint]:
+        """Новая точка на набор изменений change_id (по умолчанию — последний, старше lag секунд).
+
+        Точка не создаётся (None), если с предыдущей прошло меньше every наборов изменений.
+        Отставание lag оставляет время закоммититься записям, чьё created_at уже меньше taken_at.
+        """
+        every = settings.PERSONS_CHECKPOINT_EVERY if every is None else every
+        lag = settings.PERSONS_CHECKPOINT_LAG if lag is None else lag
+
+        changes = ChangeSet.objects.order_by('-id')
+        if change_id is not None:
+            change = changes.filter(id=change_id).first()
+        else:
+            change = changes.filter(authored_at__lte=timezone.now() - timedelta(seconds=lag)).first()
+        if change is None:
+            return None
+
+        last = (
+            StateCheckpoint.objects
+            .filter(invalidated_at__isnull=True)
+            .order_by('-change_id')
+            .values_list('change_id', flat=True)
+            .first()
+        )
+        if last is not None and change_id is None and change.id - last < every:
+            return None
+
+        versions_sql, params = CheckpointService.person_versions_sql(change.authored_at)
+        with transaction.atomic():
+            checkpoint = StateCheckpoint.objects.create(change=change, taken_at=change.authored_at)
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"""
+                    INSERT INTO state_checkpoint_row (checkpoint_id, group_id, {', '.join(VERSION_FIELDS)},
+                                                      version_at, person_id)
+                    SELECT DISTINCT ON (v.group_id) %s, v.group_id, {', '.join('v.' + c for c in VERSION_FIELDS)},
+                           v.version_at, v.id
+                    FROM ({versions_sql}) v
+                    ORDER BY v.group_id, v.version_at DESC, v.id DESC
+                    """,
+                    [checkpoint.id] + params,
+                )
+                checkpoint.group_count = cursor.rowcount
+            checkpoint.save(update_fields=['group_count'])
+        return checkpoint
+
+    @staticmethod
+    def invalidate():
+        """Пометить все точки устаревшими (прошлые версии переписаны); удаляет их prune"""
+        StateCheckpoint.objects.filter(invalidated_at__isnull=True).update(invalidated_at=timezone.now())
+
+    @staticmethod
+    def prune(keep: int) -> int:
+        """Удалить устаревшие точки и все действующие, кроме keep последних; число удалённых"""
+        kept = list(
+            StateCheckpoint.objects
+            .filter(invalidated_at__isnull=True)
+            .order_by('-taken_at', '-id')
+            .values_list('id', flat=True)[:keep]
+        )
+        deleted, _ = StateCheckpoint.objects.exclude(id__in=kept).delete()
+        return deleted
+
+    @staticmethod
+    def rebuild() -> List[StateCheckpoint]:
+        """Пересоздать точки (в том числе устаревшие) на те же наборы изменений, от старых к новым"""
+        change_ids = sorted(set(StateCheckpoint.objects.values_list('change_id', flat=True)))
+        StateCheckpoint.objects.all().delete()
+        return [CheckpointService.create(change_id=change_id) for change_id in change_ids]
@@ -0,0 +1,180 @@
+import sys
+import threading
+import time
+from django.conf import settings
+from django.db import connection
+from typing import Optional, Dict, Any, Iterable, List
+
+from .models import Person
+from .group_aliases import resolve_group_id
+
+
+class DedupIndex:
+    """Внутрипроцессный индекс дедупликации.
+
+    Ключ блокировки (пол, имя, отчество, фамилия для мужчин) отображается в словарь
+    контактов: (вид, значение) -> все group_id с этим контактом. Поиск групп — это несколько
+    проб словаря вместо запроса к базе. Согласованность между воркерами поддерживается
+    догрузкой записей с change_id выше отметки (high-water mark) последней загрузки.
+    Слияния групп индекс не трогают: слитые id разрешаются через person_group_alias
+    при пробе. Код, переписывающий группы целиком, увеличивает поколение
+    (dedup_index_generation) — увидев новое поколение, воркер загружает индекс заново.
+    """
+
+    FIELDS = ('group_id', 'gender', 'first_name', 'middle_name', 'last_name',
+              'address_key', 'phone_key', 'email_key', 'change_id')
+
+    def __init__(self, overlap: int = 100, refresh_interval: float = 1.0):
+        # Наборы изменений коммитятся не по порядку id, поэтому догрузка
+        # перечитывает окно из overlap последних наборов
+        self.overlap = overlap
+        self.refresh_interval = refresh_interval
+        self._buckets = {}
+        self._hwm = None
+        self._generation = None
+        self._last_refresh = 0.0
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def blocking_key(gender: str, first_name: str, middle_name: Optional[str], last_name: str) -> tuple:
+        """Ключ блокировки: фамилия участвует только для мужчин"""
+        return (
+            gender,
+            sys.intern(first_name),
+            sys.intern(middle_name) if middle_name is not None else None,
+            sys.intern(last_name) if gender == 'М' else None,
+        )
+
+    @property
+    def is_warm(self) -> bool:
+        return self._hwm is not None
+
+    def add(self, group_id: int, gender: str, first_name: str, middle_name: Optional[str],
+            last_name: str, address_key: Optional[str], phone_key: Optional[str], email_key: Optional[str]):
+        """Добавить версию человека в индекс по нормализованным ключам контактов (идемпотентно)"""
+        if group_id is None:
+            return
+        key = self.blocking_key(gender, first_name, middle_name, last_name)
+        with self._lock:
+            bucket = self._buckets.setdefault(key, {})
+            for contact in (('address_key', address_key), ('phone_key', phone_key), ('email_key', email_key)):
+                groups = bucket.get(contact, frozenset())
+                if contact[1] and group_id not in groups:
+                    # Множество заменяется целиком — пробы читают его без блокировки
+                    bucket[contact] = groups | {group_id}
+
+    def add_person(self, person: Person):
+        self.add(person.group_id, person.gender, person.first_name, person.middle_name,
+                 person.last_name, person.address_key, person.phone_key, person.email_key)
+
+    def _load(self, rows: Iterable[tuple]):
+        hwm = self._hwm or 0
+        for group_id, gender, first_name, middle_name, last_name, address_key, phone_key, email_key, change_id in rows:
+            self.add(group_id, gender, first_name, middle_name, last_name, address_key, phone_key, email_key)
+            if change_id is not None and change_id > hwm:
+                hwm = change_id
+        self._hwm = hwm
+
+    @staticmethod
+    def generation() -> int:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT generation FROM dedup_index_generation")
+            row = cursor.fetchone()
+        return row[0] if row else 0
+
+    @staticmethod
+    def bump_generation():
+        """Пометить индексы всех воркеров устаревшими (в текущей транзакции записи)"""
+        with connection.cursor() as cursor:
+            cursor.execute("UPDATE dedup_index_generation SET generation = generation + 1")
+
+    def invalidate(self):
+        """Сбросить индекс процесса: следующая проба загрузит его заново"""
+        with self._lock:
+            self._buckets = {}
+            self._hwm = None
+            self._generation = None
+
+    def warm_up(self):
+        """Полная загрузка индекса из таблицы person"""
+        with self._lock:
+            self._buckets = {}
+            self._hwm = None
+            self._generation = self.generation()
+            rows = Person.objects.order_by().values_list(*self.FIELDS).iterator(chunk_size=10000)
+            self._load(rows)
+            self._last_refresh = time.monotonic()
+
+    def catch_up(self, force: bool = False):
+        """Догрузка записей, созданных другими воркерами после последней загрузки.
+
+        Не чаще refresh_interval секунд, если не force.
+        """
+        with self._lock:
+            if not self.is_warm:
+                self.warm_up()
+                return
+            now = time.monotonic()
+            if not force and now - self._last_refresh < self.refresh_interval:
+                return
+            if self.generation() != self._generation:
+                self.warm_up()
+                return
+            rows = (
+                Person.objects
+                .filter(change_id__gt=self._hwm - self.overlap)
+                .order_by()
+                .values_list(*self.FIELDS)
+            )
+            self._load(rows)
+            self._last_refresh = now
+
+    def find_matching_groups(self, person_data: Dict[str, Any], refresh: bool = True) -> List[int]:
+        """Поиск групп по тем же правилам, что и PersonService.find_matching_groups.
+
+        refresh=False — без догрузки (вызывающий уже догрузил индекс для всей пачки).
+        """
+        from .services import PersonService
+
+        if refresh:
+            self.catch_up()
+        key = self.blocking_key(
+            person_data['gender'], person_data['first_name'],
+            person_data.get('middle_name'), person_data['last_name'],
+        )
+        bucket = self._buckets.get(key)
+        if not bucket:
+            return []
+        group_ids = set()
+        for contact in PersonService.contact_keys(person_data):
+            group_ids.update(bucket.get(contact, ()))
+        # В индексе могут остаться id групп, слитых позже
+        return sorted({resolve_group_id(group_id) for group_id in group_ids})
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'blocking_keys': len(self._buckets),
+                'contacts': sum(len(bucket) for bucket in self._buckets.values()),
+                'high_water_mark': self._hwm,
+                'generation': self._generation,
+            }
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_dedup_index() -> Optional[DedupIndex]:
+    """Индекс процесса, если он включён настройкой PERSONS_DEDUP_INDEX"""
+    global _index
+    if not settings.PERSONS_DEDUP_INDEX:
+        return None
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = DedupIndex(
+                    overlap=settings.PERSONS_DEDUP_INDEX_OVERLAP,
+                    refresh_interval=settings.PERSONS_DEDUP_INDEX_REFRESH,
+                )
+    return _index
@@ -0,0 +1,89 @@
+import csv
+import json
+from datetime import date, datetime
+from typing import Iterator, Tuple
+
+from .models import Person, GroupVitrine
+
+
+class _Echo:
+    """Псевдофайл для csv.writer: write возвращает строку, а не пишет её"""
+
+    def write(self, value):
+        return value
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f'Cannot export {type(value).__name__}')
+
+
+class ExportService:
+    """Потоковая выгрузка людей и витрины в CSV/JSONL.
+
+    Строки читаются серверным курсором (iterator) кортежами values_list, без
+    создания моделей, и отдаются кусками — память не зависит от размера таблицы.
+    """
+
+    DEFAULT_CHUNK_SIZE = 5000
+
+    SOURCES = {
+        'persons': (Person, ('id', 'group_id', 'change_id', 'last_name', 'first_name', 'middle_name',
+                             'birth_date', 'gender', 'address', 'phone', 'email', 'created_at')),
+        'vitrine': (GroupVitrine, ('group_id', 'person_id', 'change_id', 'last_name', 'first_name', 'middle_name',
+                                   'birth_date', 'gender', 'address', 'phone', 'email', 'created_at')),
+    }
+
+    @staticmethod
+    def iter_rows(source: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Tuple[Tuple[str, ...], Iterator[tuple]]:
+        """Имена полей и итератор кортежей источника в порядке первичного ключа"""
+        model, fields = ExportService.SOURCES[source]
+        rows = (
+            model.objects
+            .order_by('pk')
+            .values_list(*fields)
+            .iterator(chunk_size=chunk_size)
+        )
+        return fields, rows
+
+    @staticmethod
+    def iter_jsonl(source: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[str]:
+        """JSONL: один объект на строку, строки отдаются пачками по chunk_size"""
+        fields, rows = ExportService.iter_rows(source, chunk_size)
+        dumps = json.JSONEncoder(ensure_ascii=False, default=_default, separators=(',', ':')).encode
+        buffer = []
+        for row in rows:
+            buffer.append(dumps(dict(zip(fields, row))))
+            if len(buffer) >= chunk_size:
+                yield '\n'.join(buffer) + '\n'
+                buffer = []
+        if buffer:
+            yield '\n'.join(buffer) + '\n'
+
+    @staticmethod
+    def iter_csv(source: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[str]:
+        """CSV с заголовком (тот же формат, что принимает import_persons); NULL — пустая ячейка"""
+        fields, rows = ExportService.iter_rows(source, chunk_size)
+        writer = csv.writer(_Echo())
+        yield writer.writerow(fields)
+        buffer = []
+        for row in rows:
+            buffer.append(writer.writerow(
+                [value.isoformat() if isinstance(value, (datetime, date)) else value for value in row]
+            ))
+            if len(buffer) >= chunk_size:
+                yield ''.join(buffer)
+                buffer = []
+        if buffer:
+            yield ''.join(buffer)
+
+    @staticmethod
+    def iter_export(source: str, fmt: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[str]:
+        if source not in ExportService.SOURCES:
+            raise ValueError(f'Unknown export source: {source}')
+        if fmt == 'csv':
+            return ExportService.iter_csv(source, chunk_size)
+        if fmt == 'jsonl':
+            return ExportService.iter_jsonl(source, chunk_size)
+        raise ValueError(f'Unknown export format: {fmt}')
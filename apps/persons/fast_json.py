@@ -0,0 +1,60 @@
+import json
+from datetime import date, datetime
+from django.conf import settings
+from django.http import HttpResponse
+from typing import Any, Dict, Iterable, List, Sequence
+
+try:
+    import orjson
+except ImportError:  # необязательная зависимость, без неё работает stdlib json
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        # Как DRF при TIME_ZONE = 'UTC': 2024-01-01T10:00:00.123456Z
+        return value.isoformat().replace('+00:00', 'Z')
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), default=_default)
+
+
+def dumps(data: Any) -> bytes:
+    """JSON в байтах: orjson, если установлен, иначе stdlib json"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+    return _encoder.encode(data).encode('utf-8')
+
+
+class RowLayout:
+    """Заранее вычисленная раскладка столбцов values_list в ключи ответа"""
+
+    def __init__(self, fields: Sequence[str], keys: Sequence[str] = None):
+        self.fields = tuple(fields)
+        self.keys = tuple(keys or fields)
+
+    def to_dict(self, row: tuple) -> Dict[str, Any]:
+        return dict(zip(self.keys, row))
+
+    def to_dicts(self, rows: Iterable[tuple]) -> List[Dict[str, Any]]:
+        keys = self.keys
+        return [dict(zip(keys, row)) for row in rows]
+
+
+class FastJsonResponse(HttpResponse):
+    """Ответ, сериализованный dumps() напрямую, без рендереров DRF"""
+
+    def __init__(self, data: Any, status: int = 200, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps(data), status=status, **kwargs)
+
+
+def fast_json_enabled(request, endpoint: str) -> bool:
+    """Быстрый путь для endpoint: параметр ?serializer=fast|default или настройка PERSONS_FAST_JSON_ENDPOINTS"""
+    choice = request.GET.get('serializer')
+    if choice in ('fast', 'default'):
+        return choice == 'fast'
+    return endpoint in settings.PERSONS_FAST_JSON_ENDPOINTS
@@ -0,0 +1,76 @@
+import threading
+import time
+from django.conf import settings
+from typing import Optional
+
+from .models import PersonGroupAlias
+from .union_find import UnionFind
+
+
+class GroupAliasResolver:
+    """Разрешение старых id слитых групп в актуальные.
+
+    Таблица person_group_alias загружается в union-find, после чего разрешение id —
+    это find() со сжатием путей без запроса к базе. Слияния из других воркеров
+    догружаются по change_id выше последней отметки не чаще refresh_interval.
+    """
+
+    def __init__(self, refresh_interval: float = 1.0, overlap: int = 100):
+        self.refresh_interval = refresh_interval
+        self.overlap = overlap
+        self._uf = None
+        self._hwm = 0
+        self._last_refresh = 0.0
+        self._lock = threading.RLock()
+
+    def add(self, group_id: int, target_id: int):
+        with self._lock:
+            if self._uf is not None:
+                self._uf.union(group_id, target_id)
+
+    def _load(self, qs):
+        for group_id, target_id, change_id in qs.values_list('group_id', 'target_id', 'change_id'):
+            self._uf.union(group_id, target_id)
+            if change_id is not None and change_id > self._hwm:
+                self._hwm = change_id
+
+    def refresh(self, force: bool = False):
+        with self._lock:
+            now = time.monotonic()
+            if self._uf is None:
+                self._uf = UnionFind()
+                self._hwm = 0
+                self._load(PersonGroupAlias.objects.all())
+            elif force or now - self._last_refresh >= self.refresh_interval:
+                self._load(PersonGroupAlias.objects.filter(change_id__gt=self._hwm - self.overlap))
+            else:
+                return
+            self._last_refresh = now
+
+    def resolve(self, group_id: Optional[int]) -> Optional[int]:
+        """Актуальный id группы (сам group_id, если группа не сливалась)"""
+        if group_id is None:
+            return None
+        self.refresh()
+        with self._lock:
+            if group_id not in self._uf:
+                return group_id
+            return self._uf.find(group_id)
+
+
+_resolver = None
+_resolver_lock = threading.Lock()
+
+
+def get_group_resolver() -> GroupAliasResolver:
+    global _resolver
+    if _resolver is None:
+        with _resolver_lock:
+            if _resolver is None:
+                _resolver = GroupAliasResolver(refresh_interval=settings.PERSONS_GROUP_ALIAS_REFRESH)
+    return _resolver
+
+
+def resolve_group_id(group_id: Optional[int]) -> Optional[int]:
+    """Актуальный id группы с учётом слияний"""
+    return get_group_resolver().resolve(group_id)
@@ -0,0 +1,141 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils import timezone
+from typing import Any, Callable, Dict, Optional, Tuple
+import json
+
+from .models import IdempotencyKey
+
+
+MAX_KEY_LENGTH = 200
+
+
+class IdempotencyStore:
+    """Хранилище ответов по ключам идемпотентности (заголовок Idempotency-Key).
+
+    Повтор запроса с уже виденным ключом отдаёт исходный ответ без записи.
+    Первый уровень — ограниченный LRU в памяти процесса, второй — таблица
+    idempotency_key в Postgres (общая для воркеров) со сроком жизни ключа.
+    """
+
+    PURGE_INTERVAL = 60.0
+
+    def __init__(self, max_entries: int = 10000, ttl: int = 86400):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+
+    def _cache_get(self, key: str) -> Optional[Tuple[int, Dict[str, Any]]]:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            expires_at, status_code, body = entry
+            if expires_at <= timezone.now():
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return status_code, body
+
+    def _cache_put(self, key: str, expires_at, status_code: int, body: Dict[str, Any]):
+        with self._lock:
+            self._cache[key] = (expires_at, status_code, body)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """Сохранённый ответ (код, тело) или None"""
+        cached = self._cache_get(key)
+        if cached:
+            return cached
+        record = (
+            IdempotencyKey.objects
+            .filter(key=key, expires_at__gt=timezone.now(), status_code__isnull=False)
+            .first()
+        )
+        if not record:
+            return None
+        self._cache_put(key, record.expires_at, record.status_code, record.response)
+        return record.status_code, record.response
+
+    def _reserve(self, key: str, expires_at) -> bool:
+        """Занять ключ в текущей транзакции.
+
+        Параллельный запрос с тем же ключом ждёт на строке до коммита первого
+        и затем получает False. Просроченный ключ занимается заново.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO idempotency_key (key, created_at, expires_at)
+                VALUES (%s, now(), %s)
+                ON CONFLICT (key) DO UPDATE
+                  SET created_at = now(), expires_at = EXCLUDED.expires_at,
+                      status_code = NULL, response = NULL
+                  WHERE idempotency_key.expires_at <= now()
+                RETURNING key
+                """,
+                [key, expires_at],
+            )
+            return cursor.fetchone() is not None
+
+    def purge_expired(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._last_purge < self.PURGE_INTERVAL:
+            return
+        self._last_purge = now
+        IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()
+
+    def run(self, key: str, handler: Callable[[], Tuple[int, Dict[str, Any]]]) -> Tuple[int, Dict[str, Any], bool]:
+        """Выполнить handler не больше одного раза на ключ.
+
+        Возвращает (код, тело, replayed). Сохраняются только успешные (2xx)
+        ответы; при ошибке ключ освобождается и повтор выполнится заново.
+        """
+        cached = self.get(key)
+        if cached:
+            return cached + (True,)
+
+        self.purge_expired()
+        expires_at = timezone.now() + timedelta(seconds=self.ttl)
+        with transaction.atomic():
+            if not self._reserve(key, expires_at):
+                cached = self.get(key)
+                if cached:
+                    return cached + (True,)
+                raise RuntimeError(f'Idempotency key {key} is in an inconsistent state')
+
+            status_code, body = handler()
+            if not 200 <= status_code < 300:
+                transaction.set_rollback(True)
+                return status_code, body, False
+
+            # Тело хранится в том же виде, в каком уйдёт клиенту повторно
+            body = json.loads(json.dumps(body, cls=DjangoJSONEncoder))
+            IdempotencyKey.objects.filter(key=key).update(status_code=status_code, response=body)
+            transaction.on_commit(lambda: self._cache_put(key, expires_at, status_code, body))
+        return status_code, body, False
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_idempotency_store() -> IdempotencyStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = IdempotencyStore(
+                    max_entries=settings.PERSONS_IDEMPOTENCY_CACHE_SIZE,
+                    ttl=settings.PERSONS_IDEMPOTENCY_TTL,
+                )
+    return _store
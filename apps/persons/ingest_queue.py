@@ -0,0 +1,95 @@
+from django.db import transaction
+from django.utils import timezone
+from typing import Optional, Dict, Any
+
+from .models import IngestTicket
+from .bulk_service import BulkImportService
+
+
+class IngestQueueService:
+    """Асинхронное создание людей через очередь в Postgres.
+
+    API кладёт проверенные данные в person_ingest_queue и сразу отвечает 202 с номером
+    квитанции. Воркер (manage.py process_ingest_queue) забирает ожидающие квитанции
+    пачками через FOR UPDATE SKIP LOCKED и проводит их через массовую вставку.
+    """
+
+    DEFAULT_BATCH_SIZE = 500
+
+    @staticmethod
+    def enqueue(person_data: Dict[str, Any]) -> IngestTicket:
+        """Поставить данные человека в очередь"""
+        return IngestTicket.objects.create(payload=person_data)
+
+    @staticmethod
+    def get_ticket(ticket_id: int) -> Optional[Dict[str, Any]]:
+        """Статус квитанции: person_id/group_id после обработки"""
+        ticket = IngestTicket.objects.filter(id=ticket_id).first()
+        if not ticket:
+            return None
+        return {
+            'ticket_id': ticket.id,
+            'status': ticket.status,
+            'person_id': ticket.person_id,
+            'group_id': ticket.group_id,
+            'error': ticket.error,
+            'enqueued_at': ticket.enqueued_at.isoformat(),
+            'processed_at': ticket.processed_at.isoformat() if ticket.processed_at else None,
+        }
+
+    @staticmethod
+    @transaction.atomic
+    def process_batch(batch_size: int = DEFAULT_BATCH_SIZE, author: str = 'system') -> Dict[str, int]:
+        """Обработать одну пачку ожидающих квитанций.
+
+        Квитанции, заблокированные другими воркерами, пропускаются, поэтому воркеры
+        можно запускать параллельно. Возвращает число обработанных и ошибочных квитанций.
+        """
+        tickets = list(
+            IngestTicket.objects
+            .select_for_update(skip_locked=True)
+            .filter(status=IngestTicket.STATUS_PENDING)
+            .order_by('id')[:batch_size]
+        )
+        if not tickets:
+            return {'processed': 0, 'failed': 0}
+
+        report = BulkImportService.new_report()
+        valid = []
+        for ticket in tickets:
+            result = BulkImportService.validate_row(ticket.id, ticket.payload, report)
+            if result:
+                valid.append((ticket.id,) + result)
+        errors = {error['row']: str(error['errors']) for error in report['errors']}
+
+        persons = {}
+        # Пачка только из невалидных квитанций: без пустого набора изменений
+        if valid:
+            try:
+                with transaction.atomic():
+                    created = BulkImportService.write_batch(valid, author, 'Async person ingestion')
+                persons = {row[0]: person for row, person in zip(valid, created)}
+            except Exception:
+                # Ошибка всей пачки: проводим квитанции по одной, чтобы изолировать виновную
+                for row in valid:
+                    try:
+                        with transaction.atomic():
+                            persons[row[0]] = BulkImportService.write_batch([row], author, 'Async person ingestion')[0]
+                    except Exception as e:
+                        errors[row[0]] = str(e)
+
+        now_ts = timezone.now()
+        for ticket in tickets:
+            ticket.processed_at = now_ts
+            person = persons.get(ticket.id)
+            if person:
+                ticket.status = IngestTicket.STATUS_DONE
+                ticket.person_id = person.id
+                ticket.group_id = person.group_id
+            else:
+                ticket.status = IngestTicket.STATUS_FAILED
+                ticket.error = errors.get(ticket.id, 'Unknown error')
+        IngestTicket.objects.bulk_update(
+            tickets, ['status', 'processed_at', 'person', 'group', 'error']
+        )
+        return {'processed': len(tickets), 'failed': len(tickets) - len(persons)}
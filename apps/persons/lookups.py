@@ -0,0 +1,18 @@
+from django.db.models import CharField, TextField
+from django.db.models.lookups import PatternLookup
+
+
+@CharField.register_lookup
+@TextField.register_lookup
+class TrigramContains(PatternLookup):
+    """Подстрока без учёта регистра в виде col ILIKE '%x%'.
+
+    В отличие от icontains (UPPER(col) LIKE UPPER(...)), столбец не оборачивается
+    в функцию, поэтому запрос обслуживает GIN-индекс с gin_trgm_ops.
+    """
+    lookup_name = 'trgm_contains'
+
+    def as_sql(self, compiler, connection):
+        lhs_sql, lhs_params = self.process_lhs(compiler, connection)
+        rhs_sql, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs_sql} ILIKE {rhs_sql}', (*lhs_params, *rhs_params)
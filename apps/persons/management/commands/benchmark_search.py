@@ -0,0 +1,179 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+import statistics
+import time
+from apps.persons.models import Person, ChangeSet
+from apps.persons.services import PersonService
+from apps.persons.vitrine import VitrineService
+
+
+BENCHMARK_REASON = 'benchmark_search synthetic rows'
+
+STEMS = ['Иван', 'Петр', 'Сидор', 'Кузнец', 'Смирн', 'Попов', 'Соколь', 'Лебед', 'Козл', 'Новик',
+         'Морозь', 'Волк', 'Соловь', 'Васильк', 'Зайц', 'Павл', 'Семен', 'Голуб', 'Виноград', 'Богдан']
+ENDINGS = ['ов', 'ев', 'ин', 'ский', 'енко', 'ук', 'ич', 'як']
+FIRST_NAMES = ['Иван', 'Пётр', 'Сергей', 'Алексей', 'Дмитрий', 'Андрей', 'Михаил', 'Николай',
+               'Мария', 'Анна', 'Елена', 'Ольга', 'Татьяна', 'Наталья', 'Ирина', 'Светлана']
+MIDDLE_NAMES = ['Иванович', 'Петрович', 'Сергеевич', 'Алексеевич', 'Дмитриевич', 'Андреевич']
+CITIES = ['Москва', 'Казань', 'Самара', 'Пермь', 'Томск', 'Омск', 'Тверь', 'Курск']
+STREETS = ['Ленина', 'Мира', 'Гагарина', 'Садовая', 'Школьная', 'Советская', 'Лесная', 'Набережная']
+
+QUERIES = [
+    {'last_name': 'енко'},
+    {'last_name': 'Соколь', 'first_name': 'Анна'},
+    {'address': 'ул. Гагарина, д. 17'},
+    {'email': 'smirn'},
+    {'last_name': 'ов', 'address': 'казань'},
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure vitrine search latency in trigram and legacy contains modes. '
+        'With --rows the person table is first filled with synthetic rows up to each size.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=str,
+            default='',
+            help='Comma-separated table sizes to grow to before measuring, e.g. 1000000,10000000'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Runs per query and mode (default: 20)'
+        )
+        parser.add_argument(
+            '--modes',
+            type=str,
+            default='contains,trigram',
+            help='Comma-separated search modes to compare (default: contains,trigram)'
+        )
+        parser.add_argument(
+            '--cleanup',
+            action='store_true',
+            help='Delete the synthetic rows created by earlier runs and exit'
+        )
+
+    def handle(self, *args, **options):
+        if options['cleanup']:
+            self._cleanup()
+            return
+
+        modes = options['modes'].split(',')
+        for mode in modes:
+            if mode not in ('contains', 'trigram'):
+                raise CommandError(f'Unknown mode: {mode}')
+        try:
+            sizes = [int(n) for n in options['rows'].split(',') if n]
+        except ValueError:
+            raise CommandError('--rows must be a comma-separated list of integers')
+
+        for size in sizes or [None]:
+            if size is not None:
+                self._grow_to(size)
+            total = Person.objects.count()
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{total} rows in person'))
+            for params in QUERIES:
+                for mode in modes:
+                    self._measure(params, mode, options['repeat'])
+
+    def _measure(self, params, mode, repeat):
+        search = {**params, 'mode': mode, 'limit': 100, 'offset': 0}
+        qs, ordering = PersonService.vitrine_queryset(search)
+        plan = qs.order_by(*ordering)[:100].explain()
+        timings = []
+        found = 0
+        for _ in range(repeat):
+            started = time.perf_counter()
+            found = len(PersonService.search_persons_vitrine_page(search, use_cache=False)[0])
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        access = 'index' if 'Index' in plan else 'seq scan'
+        self.stdout.write(
+            f'{mode:>8} {params}: p50={statistics.median(timings):.1f}ms '
+            f'p95={p95:.1f}ms found={found} ({access})'
+        )
+
+    def _grow_to(self, size):
+        missing = size - Person.objects.count()
+        if missing <= 0:
+            return
+        self.stdout.write(f'Inserting {missing} synthetic rows...')
+        started = time.monotonic()
+        with transaction.atomic(), connection.cursor() as cursor:
+            change_set = PersonService.create_change_set(author='benchmark', reason=BENCHMARK_REASON)
+            cursor.execute(
+                """
+                WITH g AS (
+                    SELECT n, nextval(pg_get_serial_sequence('person_group', 'id')) AS gid
+                    FROM generate_series(1, %(missing)s) n
+                ),
+                grp AS (
+                    INSERT INTO person_group (id) SELECT gid FROM g
+                ),
+                src AS (
+                    SELECT g.gid, n,
+                           (%(stems)s::text[])[1 + n %% %(n_stems)s]
+                             || (%(endings)s::text[])[1 + (n / %(n_stems)s) %% %(n_endings)s] AS last_name,
+                           (%(first)s::text[])[1 + (n / 7) %% %(n_first)s] AS first_name,
+                           (%(middle)s::text[])[1 + (n / 11) %% %(n_middle)s] AS middle_name,
+                           (%(cities)s::text[])[1 + (n / 13) %% %(n_cities)s] AS city,
+                           (%(streets)s::text[])[1 + (n / 17) %% %(n_streets)s] AS street,
+                           1 + n %% 200 AS house
+                    FROM g
+                )
+                INSERT INTO person (group_id, change_id, last_name, first_name, middle_name, birth_date,
+                                    gender, address, address_key, email, email_key, created_at, is_current)
+                SELECT gid, %(change_id)s, last_name, first_name, middle_name,
+                       DATE '1950-01-01' + (n %% 20000),
+                       CASE WHEN n %% 2 = 0 THEN 'М' ELSE 'Ж' END,
+                       'г. ' || city || ', ул. ' || street || ', д. ' || house,
+                       lower('г ' || city || ' ул ' || street || ' д ' || house),
+                       'user' || n || '@bench.example',
+                       'user' || n || '@bench.example',
+                       now(), true
+                FROM src
+                """,
+                {
+                    'missing': missing, 'change_id': change_set.id,
+                    'stems': STEMS, 'n_stems': len(STEMS),
+                    'endings': ENDINGS, 'n_endings': len(ENDINGS),
+                    'first': FIRST_NAMES, 'n_first': len(FIRST_NAMES),
+                    'middle': MIDDLE_NAMES, 'n_middle': len(MIDDLE_NAMES),
+                    'cities': CITIES, 'n_cities': len(CITIES),
+                    'streets': STREETS, 'n_streets': len(STREETS),
+                },
+            )
+            VitrineService.refresh_change(change_set.id)
+            PersonService.invalidate_search_cache()
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE person')
+            cursor.execute('ANALYZE group_vitrine')
+        self.stdout.write(f'  done in {time.monotonic() - started:.1f}s')
+
+    def _cleanup(self):
+        change_ids = list(ChangeSet.objects.filter(reason=BENCHMARK_REASON).values_list('id', flat=True))
+        if not change_ids:
+            self.stdout.write('No synthetic rows found')
+            return
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                """
+                WITH vitrine AS (
+                    DELETE FROM group_vitrine WHERE change_id = ANY(%s)
+                ),
+                removed AS (
+                    DELETE FROM person WHERE change_id = ANY(%s) RETURNING group_id
+                )
+                DELETE FROM person_group WHERE id IN (SELECT group_id FROM removed)
+                """,
+                [change_ids, change_ids],
+            )
+            deleted = cursor.rowcount
+            ChangeSet.objects.filter(id__in=change_ids).delete()
+        self.stdout.write(self.style.SUCCESS(f'Removed {deleted} synthetic groups'))
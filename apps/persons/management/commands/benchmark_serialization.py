@@ -0,0 +1,86 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from datetime import date
+from rest_framework.renderers import JSONRenderer
+import statistics
+import time
+from apps.persons.fast_json import dumps
+from apps.persons.models import Person
+from apps.persons.serializers import PersonSerializer, PersonVitrineSerializer
+from apps.persons.services import PersonService, PERSON_LAYOUT, VITRINE_LAYOUT
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the DRF serializer path with the values_list + fast JSON path of read endpoints. '
+        'With --in-memory rows are synthesized, so only serialization CPU is measured.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=1000,
+            help='Rows per response (default: 1000)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Runs per path (default: 20)'
+        )
+        parser.add_argument(
+            '--in-memory',
+            action='store_true',
+            help='Serialize synthetic rows instead of reading the person table'
+        )
+
+    def handle(self, *args, **options):
+        rows, repeat = options['rows'], options['repeat']
+        if rows < 1 or repeat < 1:
+            raise CommandError('--rows and --repeat must be positive')
+
+        if options['in_memory']:
+            values = [self._row(n) for n in range(rows)]
+            persons = [Person(**PERSON_LAYOUT.to_dict(row)) for row in values]
+            cases = {
+                'list (drf)': lambda: JSONRenderer().render(PersonSerializer(persons, many=True).data),
+                'list (fast)': lambda: dumps(PERSON_LAYOUT.to_dicts(values)),
+                'search (drf)': lambda: JSONRenderer().render(
+                    PersonVitrineSerializer([VITRINE_LAYOUT.to_dict(v[1:10]) for v in values], many=True).data
+                ),
+                'search (fast)': lambda: dumps([VITRINE_LAYOUT.to_dict(v[1:10]) for v in values]),
+            }
+        else:
+            cases = {
+                'list (drf)': lambda: JSONRenderer().render(
+                    PersonSerializer(PersonService.get_current_persons_page(limit=rows)[0], many=True).data
+                ),
+                'list (fast)': lambda: dumps(PersonService.get_current_persons_rows(limit=rows)[0]),
+                'search (drf)': lambda: JSONRenderer().render(PersonVitrineSerializer(
+                    PersonService.search_persons_vitrine_page({'limit': rows}, use_cache=False)[0], many=True
+                ).data),
+                'search (fast)': lambda: dumps(
+                    PersonService.search_persons_vitrine_page({'limit': rows}, use_cache=False)[0]
+                ),
+            }
+
+        for name, case in cases.items():
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                case()
+                timings.append((time.perf_counter() - started) * 1000)
+            median = statistics.median(timings)
+            self.stdout.write(
+                f'{name:>14}: p50={median:.2f}ms min={min(timings):.2f}ms '
+                f'({rows / median * 1000:.0f} rows/sec)'
+            )
+
+    @staticmethod
+    def _row(n):
+        return (
+            n, n // 3, 'Иванов', 'Иван', 'Иванович', date(1980, 1, 1 + n % 28), 'М',
+            f'г. Москва, ул. Ленина, д. {n % 200}', '+7(900)000-00-00', f'user{n}@example.com',
+            timezone.now(), True,
+        )
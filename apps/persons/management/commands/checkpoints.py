@@ -0,0 +1,86 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+import time
+from apps.persons.checkpoint_service import CheckpointService
+from apps.persons.models import StateCheckpoint
+
+
+class Command(BaseCommand):
+    help = (
+        'Maintain state checkpoints used by as-of batch queries and snapshots: '
+        'create one (run periodically, e.g. from cron), prune old ones or rebuild them all. '
+        'Without options lists existing checkpoints.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--create',
+            action='store_true',
+            help='Take a checkpoint at the latest change set older than PERSONS_CHECKPOINT_LAG, '
+                 'if at least PERSONS_CHECKPOINT_EVERY change sets passed since the previous one'
+        )
+        parser.add_argument(
+            '--change',
+            type=int,
+            default=None,
+            help='With --create: take the checkpoint at this change set id unconditionally'
+        )
+        parser.add_argument(
+            '--every',
+            type=int,
+            default=None,
+            help=f'With --create: minimum change sets between checkpoints (default: {settings.PERSONS_CHECKPOINT_EVERY})'
+        )
+        parser.add_argument(
+            '--prune',
+            action='store_true',
+            help='Delete invalidated checkpoints and all but the latest --keep ones'
+        )
+        parser.add_argument(
+            '--keep',
+            type=int,
+            default=settings.PERSONS_CHECKPOINT_KEEP,
+            help=f'With --prune: checkpoints to keep (default: {settings.PERSONS_CHECKPOINT_KEEP})'
+        )
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Recompute every checkpoint (including invalidated ones) at the same change sets'
+        )
+
+    def handle(self, *args, **options):
+        if options['keep'] < 0:
+            raise CommandError('--keep must not be negative')
+        if options['every'] is not None and options['every'] < 1:
+            raise CommandError('--every must be positive')
+
+        if options['rebuild']:
+            started = time.monotonic()
+            checkpoints = CheckpointService.rebuild()
+            self.stdout.write(self.style.SUCCESS(
+                f'Rebuilt {len(checkpoints)} checkpoints in {time.monotonic() - started:.1f}s'
+            ))
+
+        if options['create']:
+            started = time.monotonic()
+            checkpoint = CheckpointService.create(change_id=options['change'], every=options['every'])
+            if checkpoint is None:
+                self.stdout.write('No checkpoint taken: no suitable change set or too few changes since the last one')
+            else:
+                elapsed = time.monotonic() - started
+                self.stdout.write(self.style.SUCCESS(
+                    f'Checkpoint {checkpoint.id} at change {checkpoint.change_id}: {checkpoint.group_count} groups '
+                    f'in {elapsed:.1f}s ({checkpoint.group_count / elapsed if elapsed else 0:.1f} rows/sec)'
+                ))
+
+        if options['prune']:
+            deleted = CheckpointService.prune(options['keep'])
+            self.stdout.write(self.style.SUCCESS(f'Pruned {deleted} checkpoints'))
+
+        if not (options['rebuild'] or options['create'] or options['prune']):
+            for checkpoint in StateCheckpoint.objects.order_by('-taken_at', '-id'):
+                state = f'invalidated {checkpoint.invalidated_at.isoformat()}' if checkpoint.invalidated_at else 'valid'
+                self.stdout.write(
+                    f'{checkpoint.id}: change {checkpoint.change_id}, taken at {checkpoint.taken_at.isoformat()}, '
+                    f'{checkpoint.group_count} groups, {state}'
+                )
@@ -0,0 +1,81 @@
+from django.core.management.base import BaseCommand, CommandError
+import sys
+from apps.persons.bulk_service import BulkImportService
+
+
+class Command(BaseCommand):
+    help = 'Bulk import persons from a CSV or JSONL file with batched deduplication'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            type=str,
+            help='Path to CSV/JSONL file ("-" to read from stdin)'
+        )
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'jsonl'],
+            default=None,
+            help='Input format (default: detected from file extension)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BulkImportService.DEFAULT_BATCH_SIZE,
+            help=f'Rows per batch/changeset (default: {BulkImportService.DEFAULT_BATCH_SIZE})'
+        )
+        parser.add_argument(
+            '--author',
+            type=str,
+            default='system',
+            help='Author recorded in change sets (default: system)'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format']
+        if fmt is None:
+            if path.endswith('.csv'):
+                fmt = 'csv'
+            elif path.endswith(('.jsonl', '.ndjson')):
+                fmt = 'jsonl'
+            else:
+                raise CommandError('Cannot detect input format, use --format')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive')
+
+        def progress(report):
+            self.stdout.write(
+                f"batch {report['batches']}: {report['total']} rows, "
+                f"{report['created']} created, {report['failed']} failed, "
+                f"{report['rows_per_sec']} rows/sec"
+            )
+
+        stream = sys.stdin if path == '-' else open(path, 'r', encoding='utf-8', newline='')
+        try:
+            if fmt == 'csv':
+                rows = BulkImportService.iter_csv_rows(stream)
+            else:
+                rows = BulkImportService.iter_jsonl_rows(stream)
+            report = BulkImportService.import_rows(
+                rows,
+                batch_size=options['batch_size'],
+                author=options['author'],
+                progress=progress,
+            )
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        for error in report['errors']:
+            self.stdout.write(self.style.WARNING(f"row {error['row']}: {error['errors']}"))
+
+        message = (
+            f"Imported {report['created']} of {report['total']} rows "
+            f"({report['failed']} failed) in {report['elapsed_seconds']}s, "
+            f"{report['rows_per_sec']} rows/sec"
+        )
+        if report['failed']:
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS(message))
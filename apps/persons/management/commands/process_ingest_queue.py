@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+import time
+from apps.persons.ingest_queue import IngestQueueService
+
+
+class Command(BaseCommand):
+    help = 'Drain the asynchronous person ingestion queue in micro-batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=IngestQueueService.DEFAULT_BATCH_SIZE,
+            help=f'Tickets per batch (default: {IngestQueueService.DEFAULT_BATCH_SIZE})'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=1.0,
+            help='Seconds to sleep when the queue is empty (default: 1.0)'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit when the queue is empty instead of polling'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive')
+
+        self.stdout.write('Processing ingestion queue...')
+        try:
+            while True:
+                started = time.monotonic()
+                result = IngestQueueService.process_batch(batch_size=options['batch_size'])
+                if result['processed']:
+                    elapsed = time.monotonic() - started
+                    self.stdout.write(
+                        f"{result['processed']} tickets ({result['failed']} failed), "
+                        f"{result['processed'] / elapsed:.1f} rows/sec"
+                    )
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS('Ingestion queue worker stopped'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+import time
+from apps.persons.services import PersonService
+from apps.persons.vitrine import VitrineService
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the group_vitrine table (one row per group) from the person table'
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        with transaction.atomic():
+            rows = VitrineService.rebuild()
+            PersonService.invalidate_search_cache()
+        self.stdout.write(self.style.SUCCESS(
+            f'Vitrine rebuilt: {rows} groups in {time.monotonic() - started:.1f}s'
+        ))
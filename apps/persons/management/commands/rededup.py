@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand, CommandError
+from apps.persons.rededup_service import RededupService
+
+
+class Command(BaseCommand):
+    help = (
+        'Re-group the whole person table with the current matching rules. '
+        'Writes to person wait until the run commits (except with --dry-run)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Clustering processes (default: number of CPUs)'
+        )
+        parser.add_argument(
+            '--chunk-rows',
+            type=int,
+            default=20000,
+            help='Rows fetched per cursor round trip and per worker task (default: 20000)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Print the group reassignments without applying them'
+        )
+        parser.add_argument(
+            '--author',
+            type=str,
+            default='system',
+            help='Author recorded in the change set (default: system)'
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_rows'] < 1:
+            raise CommandError('--chunk-rows must be positive')
+
+        def on_move(person_id, old_group, new_group):
+            self.stdout.write(f'person {person_id}: group {old_group} -> {new_group}')
+
+        def progress(stats):
+            self.stdout.write(
+                f"{stats['rows']} rows, {stats['partitions']} partitions, "
+                f"{stats['moved']} moved, {stats['rows_per_sec']} rows/sec",
+                style_func=self.style.HTTP_INFO
+            )
+
+        service = RededupService(
+            workers=options['workers'],
+            chunk_rows=options['chunk_rows'],
+            dry_run=options['dry_run'],
+            on_move=on_move,
+            progress=progress,
+        )
+        stats = service.run(author=options['author'])
+
+        summary = (
+            f"{stats['rows']} persons in {stats['clusters']} clusters: "
+            f"{stats['moved']} reassigned, {stats['new_groups']} new groups"
+        )
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'Dry run, nothing changed. {summary}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(summary))
@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+import time
+from apps.persons.models import Person
+
+
+class Command(BaseCommand):
+    help = 'Recompute normalized search key columns of the person table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Rows updated per statement (default: 5000)'
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Recompute keys for every row, not only rows with missing keys'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be positive')
+
+        key_fields = Person.SEARCH_KEY_FIELDS
+        qs = Person.objects.order_by('id')
+        if not options['all']:
+            missing = Q()
+            for source, field in zip(Person.SEARCH_SOURCE_FIELDS, key_fields):
+                missing |= Q(**{f'{source}__isnull': False, f'{field}__isnull': True})
+            qs = qs.filter(missing)
+        rows = qs.values_list('id', *Person.SEARCH_SOURCE_FIELDS).iterator(chunk_size=batch_size)
+
+        columns = ', '.join(f'{field} = v.{field}' for field in key_fields)
+        arrays = ', '.join(['%s::int[]'] + ['%s::text[]'] * len(key_fields))
+        sql = (
+            f"UPDATE person p SET {columns} "
+            f"FROM unnest({arrays}) AS v(id, {', '.join(key_fields)}) "
+            f"WHERE p.id = v.id"
+        )
+
+        started = time.monotonic()
+        updated = 0
+        batch = []
+
+        def flush():
+            person_ids = [person.id for person in batch]
+            values = [[getattr(person, field) for person in batch] for field in key_fields]
+            with connection.cursor() as cursor:
+                cursor.execute(sql, [person_ids] + values)
+
+        for row in rows:
+            person = Person(id=row[0], **dict(zip(Person.SEARCH_SOURCE_FIELDS, row[1:])))
+            person.fill_search_keys()
+            batch.append(person)
+            if len(batch) >= batch_size:
+                flush()
+                updated += len(batch)
+                batch = []
+                self.stdout.write(f'{updated} rows, {updated / (time.monotonic() - started):.1f} rows/sec')
+        if batch:
+            flush()
+            updated += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'Search keys refreshed for {updated} rows'))
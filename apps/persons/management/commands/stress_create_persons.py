@@ -0,0 +1,164 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from concurrent.futures import ThreadPoolExecutor
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import requests
+from apps.persons.models import Person
+
+
+FIRST_NAMES = ['Иван', 'Пётр', 'Сергей', 'Алексей', 'Дмитрий', 'Андрей', 'Михаил', 'Николай']
+MIDDLE_NAMES = ['Иванович', 'Петрович', 'Сергеевич', 'Алексеевич']
+LAST_NAMES = ['Нагрузов', 'Стрессов', 'Потоков', 'Параллелев']
+# Буквы суффикса фамилии: у каждой идентичности свой ключ блокировки
+SUFFIX_LETTERS = 'абвгдежзиклмнопрстуфхцчшэюя'
+
+
+class Command(BaseCommand):
+    help = (
+        'POST the same persons to /api/persons/ from many threads at once and check that no '
+        'duplicate groups appear. Without --url a development server is started with '
+        'PERSONS_DEDUP_LOCKING on. Writes to the configured database; exits non-zero on duplicates.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads',
+            type=str,
+            default='1,4,16',
+            help='Comma-separated thread counts to run (default: 1,4,16)'
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=2000,
+            help='Creates per run (default: 2000)'
+        )
+        parser.add_argument(
+            '--identities',
+            type=int,
+            default=50,
+            help='Distinct persons that requests are spread over (default: 50)'
+        )
+        parser.add_argument(
+            '--url',
+            type=str,
+            default='',
+            help='Base URL of a running server started with PERSONS_DEDUP_LOCKING=True '
+                 '(default: start one on a free local port)'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            thread_counts = [int(n) for n in options['threads'].split(',')]
+        except ValueError:
+            raise CommandError('--threads must be a comma-separated list of integers')
+
+        server = None
+        base_url = options['url'].rstrip('/')
+        if not base_url:
+            server, base_url = self._start_server()
+        try:
+            failed_runs = self._run(base_url, thread_counts, options)
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+        if failed_runs:
+            raise CommandError(f'{failed_runs} run(s) failed: see the lines above')
+
+    def _run(self, base_url, thread_counts, options):
+        endpoint = f'{base_url}/api/persons/'
+        run_id = int(time.time())
+        failed_runs = 0
+        for threads in thread_counts:
+            # Отдельный адрес на каждый прогон, чтобы прогоны не сливались в группы друг друга
+            tag = f'{run_id}-{threads}'
+            payloads = [self._identity(i, tag) for i in range(options['identities'])]
+            sessions = threading.local()
+
+            def create(n):
+                if not hasattr(sessions, 'session'):
+                    sessions.session = requests.Session()
+                response = sessions.session.post(endpoint, json=payloads[n % len(payloads)], timeout=60)
+                return response.status_code
+
+            started = time.monotonic()
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                statuses = list(pool.map(create, range(options['requests'])))
+            elapsed = time.monotonic() - started
+
+            errors = sum(1 for code in statuses if code != 201)
+            duplicates = self._count_duplicates(tag)
+            line = (
+                f'threads={threads}: {options["requests"]} creates in {elapsed:.2f}s, '
+                f'{options["requests"] / elapsed:.1f} rows/sec, failed requests: {errors}, '
+                f'duplicate groups: {duplicates}'
+            )
+            if duplicates or errors:
+                failed_runs += 1
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(self.style.SUCCESS(line))
+        return failed_runs
+
+    def _start_server(self):
+        """Сервер разработки с блокировками ключей и синхронным созданием (ответ 201)"""
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        env = dict(os.environ, PERSONS_DEDUP_LOCKING='True', PERSONS_ASYNC_INGEST='False')
+        server = subprocess.Popen(
+            [sys.executable, 'manage.py', 'runserver', '--noreload', f'127.0.0.1:{port}'],
+            cwd=settings.BASE_DIR, env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        base_url = f'http://127.0.0.1:{port}'
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError('Development server exited during startup')
+            try:
+                requests.get(f'{base_url}/api/persons/list/', params={'limit': 1}, timeout=1)
+                self.stdout.write(f'Started server at {base_url} with PERSONS_DEDUP_LOCKING=True')
+                return server, base_url
+            except requests.ConnectionError:
+                time.sleep(0.2)
+        server.terminate()
+        server.wait()
+        raise CommandError('Development server did not start within 30s')
+
+    def _identity(self, i, tag):
+        # Номер идентичности буквами: в фамилии допустима только кириллица
+        suffix = ''
+        n = i
+        while True:
+            n, digit = divmod(n, len(SUFFIX_LETTERS))
+            suffix += SUFFIX_LETTERS[digit]
+            if not n:
+                break
+        return {
+            'last_name': f'{LAST_NAMES[i % len(LAST_NAMES)]}-{suffix}',
+            'first_name': FIRST_NAMES[i % len(FIRST_NAMES)],
+            'middle_name': MIDDLE_NAMES[i % len(MIDDLE_NAMES)],
+            'birth_date': '1990-01-01',
+            'gender': 'М',
+            'address': f'г. Тестовый, ул. Нагрузочная, д. {i}, прогон {tag}',
+        }
+
+    def _count_duplicates(self, tag):
+        """Число идентичностей прогона, разнесённых больше чем в одну группу"""
+        return (
+            Person.objects
+            .filter(address__endswith=f'прогон {tag}')
+            .values('address')
+            .annotate(groups=Count('group_id', distinct=True))
+            .filter(groups__gt=1)
+            .count()
+        )
@@ -1,7 +1,14 @@
 from django.db import models
+from django.contrib.postgres.fields import DateTimeRangeField
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.exceptions import ValidationError
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Reverse
 from django.utils import timezone
 import re
+from .normalization import normalize_phone_key, normalize_email_key, normalize_address_key
+from .phonetics import russian_metaphone
 
 
 class ChangeSet(models.Model):
@@ -31,6 +38,23 @@ class PersonGroup(models.Model):
         return f"Group {self.id}"
 
 
+class PersonGroupAlias(models.Model):
+    """Слитые группы: старый id группы -> группа, в которую она влита"""
+    group = models.OneToOneField(PersonGroup, on_delete=models.CASCADE, primary_key=True, related_name='alias')
+    target = models.ForeignKey(PersonGroup, on_delete=models.CASCADE, related_name='merged_aliases')
+    change = models.ForeignKey(ChangeSet, on_delete=models.SET_NULL, null=True, blank=True)
+
+    class Meta:
+        db_table = 'person_group_alias'
+        managed = False
+        indexes = [
+            models.Index(fields=['change'], name='i_group_alias_change'),
+        ]
+
+    def __str__(self):
+        return f"Group {self.group_id} -> {self.target_id}"
+
+
 class Person(models.Model):
     """Основная таблица людей с персистентностью"""
     GENDER_CHOICES = [
@@ -50,6 +74,14 @@ class Person(models.Model):
     address = models.TextField()
     phone = models.CharField(max_length=20, null=True, blank=True)
     email = models.CharField(max_length=255, null=True, blank=True)
+
+    # Нормализованные ключи контактов для сопоставления и поиска (заполняются при записи)
+    phone_key = models.CharField(max_length=20, null=True, blank=True, editable=False)
+    email_key = models.CharField(max_length=255, null=True, blank=True, editable=False)
+    address_key = models.TextField(null=True, blank=True, editable=False)
+    # Фонетические ключи ФИО для поиска с опечатками (Иванов/Иваноф)
+    last_name_phonetic = models.CharField(max_length=100, null=True, blank=True, editable=False)
+    first_name_phonetic = models.CharField(max_length=100, null=True, blank=True, editable=False)
     
     created_at = models.DateTimeField(default=timezone.now)
     is_current = models.BooleanField(default=True)
@@ -59,11 +91,31 @@ class Person(models.Model):
         managed = False  # Django не будет управлять этой таблицей
         indexes = [
             models.Index(fields=['is_current'], name='i_person_current'),
-            models.Index(fields=['group'], name='i_person_group'),
-            models.Index(fields=['phone'], name='i_person_phone'),
-            models.Index(fields=['email'], name='i_person_email'),
+            models.Index(fields=['group', 'id'], name='i_person_group_id'),
+            models.Index(fields=['group', '-created_at', '-id'], name='i_person_group_created'),
+            models.Index(fields=['-created_at', '-id'], name='i_person_created'),
+            models.Index(fields=['change'], name='i_person_change'),
+            models.Index(fields=['phone_key', 'gender', 'first_name', 'middle_name'], name='i_person_phone_key'),
+            models.Index(fields=['email_key', 'gender', 'first_name', 'middle_name'], name='i_person_email_key'),
+            models.Index(fields=['address_key', 'gender', 'first_name', 'middle_name'], name='i_person_address_key'),
         ]
 
+    # Поля-источники и вычисляемые из них ключи, попарно (см. fill_search_keys)
+    SEARCH_SOURCE_FIELDS = ('phone', 'email', 'address', 'last_name', 'first_name')
+    SEARCH_KEY_FIELDS = ('phone_key', 'email_key', 'address_key', 'last_name_phonetic', 'first_name_phonetic')
+
+    def fill_search_keys(self):
+        """Заполнение нормализованных ключей контактов и фонетических ключей ФИО из текущих значений полей"""
+        self.phone_key = normalize_phone_key(self.phone)
+        self.email_key = normalize_email_key(self.email)
+        self.address_key = normalize_address_key(self.address)
+        self.last_name_phonetic = russian_metaphone(self.last_name)
+        self.first_name_phonetic = russian_metaphone(self.first_name)
+
+    def save(self, *args, **kwargs):
+        self.fill_search_keys()
+        super().save(*args, **kwargs)
+
     def clean(self):
         """Валидация полей"""
         errors = {}
@@ -158,7 +210,132 @@ class PersonHistory(models.Model):
         managed = False 
         indexes = [
             models.Index(fields=['group', 'valid_from', 'valid_to'], name='i_hist_group_from_to'),
+            # GiST (group_id, validity) — в sqlScript.sql: validity генерируемый и в модели не описан
         ]
 
     def __str__(self):
         return f"History: {self.last_name} {self.first_name} ({self.valid_from} - {self.valid_to})"
+
+    @classmethod
+    def valid_at(cls, group_id: int, timestamp):
+        """Версии группы, действовавшие в момент timestamp: validity @> timestamp (одна проба GiST-индекса)"""
+        return (
+            cls.objects
+            .alias(validity=RawSQL('"person_history"."validity"', [], output_field=DateTimeRangeField()))
+            .filter(group_id=group_id, validity__contains=timestamp)
+            .order_by('-valid_from', '-id')
+        )
+
+
+class GroupVitrine(models.Model):
+    """Витрина: одна строка на группу с последней версией человека.
+
+    Поддерживается в той же транзакции, что и запись версии (см. VitrineService).
+    Столбец address_tsv вычисляется в базе и в модели не описан.
+    """
+    group = models.OneToOneField(PersonGroup, on_delete=models.CASCADE, primary_key=True, related_name='vitrine')
+    person = models.ForeignKey(Person, on_delete=models.DO_NOTHING, related_name='+')
+    change = models.ForeignKey(ChangeSet, on_delete=models.SET_NULL, null=True, blank=True)
+
+    last_name = models.CharField(max_length=100)
+    first_name = models.CharField(max_length=100)
+    middle_name = models.CharField(max_length=100, null=True, blank=True)
+    birth_date = models.DateField()
+    gender = models.CharField(max_length=1, choices=Person.GENDER_CHOICES)
+    address = models.TextField()
+    phone = models.CharField(max_length=20, null=True, blank=True)
+    email = models.CharField(max_length=255, null=True, blank=True)
+
+    phone_key = models.CharField(max_length=20, null=True, blank=True)
+    email_key = models.CharField(max_length=255, null=True, blank=True)
+    address_key = models.TextField(null=True, blank=True)
+    last_name_phonetic = models.CharField(max_length=100, null=True, blank=True)
+    first_name_phonetic = models.CharField(max_length=100, null=True, blank=True)
+
+    created_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'group_vitrine'
+        managed = False
+        indexes = [
+            # начало номера: phone_key LIKE '7916%'; конец номера: reverse(phone_key) LIKE '4321%'
+            models.Index(fields=['phone_key'], opclasses=['varchar_pattern_ops'], name='i_vitrine_phone_prefix'),
+            models.Index(OpClass(Reverse('phone_key'), name='text_pattern_ops'), name='i_vitrine_phone_suffix'),
+            models.Index(fields=['last_name_phonetic', 'first_name_phonetic'], name='i_vitrine_name_phonetic'),
+            models.Index(fields=['first_name_phonetic'], name='i_vitrine_first_name_phonetic'),
+            GinIndex(fields=['last_name'], opclasses=['gin_trgm_ops'], name='i_vitrine_last_name_trgm'),
+            GinIndex(fields=['first_name'], opclasses=['gin_trgm_ops'], name='i_vitrine_first_name_trgm'),
+            GinIndex(fields=['middle_name'], opclasses=['gin_trgm_ops'], name='i_vitrine_middle_name_trgm'),
+            GinIndex(fields=['address_key'], opclasses=['gin_trgm_ops'], name='i_vitrine_address_key_trgm'),
+            GinIndex(fields=['email_key'], opclasses=['gin_trgm_ops'], name='i_vitrine_email_key_trgm'),
+        ]
+
+    def __str__(self):
+        return f"Vitrine {self.group_id}: {self.last_name} {self.first_name}"
+
+
+class IngestTicket(models.Model):
+    """Очередь асинхронного создания людей (квитанции 202)"""
+    STATUS_PENDING = 'pending'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'В очереди'),
+        (STATUS_DONE, 'Обработано'),
+        (STATUS_FAILED, 'Ошибка'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    enqueued_at = models.DateTimeField(default=timezone.now)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    person = models.ForeignKey(Person, on_delete=models.SET_NULL, null=True, blank=True)
+    group = models.ForeignKey(PersonGroup, on_delete=models.SET_NULL, null=True, blank=True)
+    error = models.TextField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'person_ingest_queue'
+        managed = False
+        indexes = [
+            models.Index(fields=['id'], condition=models.Q(status='pending'), name='i_ingest_pending'),
+        ]
+
+    def __str__(self):
+        return f"Ticket {self.id} ({self.status})"
+
+
+class StateCheckpoint(models.Model):
+    """Контрольная точка состояния групп (строки — в state_checkpoint_row, см. CheckpointService)"""
+    id = models.BigAutoField(primary_key=True)
+    change = models.ForeignKey(ChangeSet, on_delete=models.CASCADE)
+    taken_at = models.DateTimeField()
+    created_at = models.DateTimeField(default=timezone.now)
+    group_count = models.IntegerField(default=0)
+    invalidated_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'state_checkpoint'
+        managed = False
+
+    def __str__(self):
+        return f"Checkpoint {self.id} @ change {self.change_id}"
+
+
+class IdempotencyKey(models.Model):
+    """Ответы на запросы с заголовком Idempotency-Key"""
+    key = models.CharField(max_length=255, primary_key=True)
+    status_code = models.IntegerField(null=True, blank=True)
+    response = models.JSONField(encoder=DjangoJSONEncoder, null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'idempotency_key'
+        managed = False
+        indexes = [
+            models.Index(fields=['expires_at'], name='i_idempotency_expires'),
+        ]
+
+    def __str__(self):
+        return f"Idempotency key {self.key}"
@@ -0,0 +1,27 @@
+import re
+from typing import Optional
+
+
+def normalize_phone_key(phone: Optional[str]) -> Optional[str]:
+    """Ключ телефона: только цифры, российский номер с 8 приводится к 7"""
+    if not phone:
+        return None
+    digits_only = re.sub(r'[^\d]', '', phone)
+    if digits_only.startswith('8') and len(digits_only) == 11:
+        digits_only = '7' + digits_only[1:]
+    return digits_only or None
+
+
+def normalize_email_key(email: Optional[str]) -> Optional[str]:
+    """Ключ email: без пробелов по краям и в нижнем регистре"""
+    if not email:
+        return None
+    return email.strip().lower() or None
+
+
+def normalize_address_key(address: Optional[str]) -> Optional[str]:
+    """Канонический ключ адреса: нижний регистр, ё -> е, пунктуация и пробелы схлопнуты"""
+    if not address:
+        return None
+    key = re.sub(r'[\W_]+', ' ', address.lower().replace('ё', 'е')).strip()
+    return key or None
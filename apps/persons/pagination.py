@@ -0,0 +1,80 @@
+import base64
+import json
+from datetime import date, datetime
+from django.db.models import Q
+from typing import Any, List, Optional, Sequence, Tuple
+
+
+class CursorError(ValueError):
+    """Некорректный или чужой токен курсора"""
+
+
+def _default(value):
+    # isoformat без потери микросекунд (DjangoJSONEncoder обрезает их до миллисекунд)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f'Cannot encode {type(value).__name__} in a cursor')
+
+
+def encode_cursor(ordering: Sequence[str], values: Sequence[Any]) -> str:
+    """Непрозрачный токен: последние значения ключа сортировки и сама сортировка"""
+    payload = json.dumps([list(ordering), list(values)], default=_default, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token: str, ordering: Sequence[str]) -> List[Any]:
+    """Значения ключа из токена; токен другой сортировки отклоняется"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        token_ordering, values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise CursorError('Invalid cursor')
+    if token_ordering != list(ordering) or not isinstance(values, list) or len(values) != len(ordering):
+        raise CursorError('Cursor does not match the requested ordering')
+    return values
+
+
+def keyset_filter(ordering: Sequence[str], values: Sequence[Any]) -> Q:
+    """Условие «строго после values» для лексикографической сортировки ordering.
+
+    Для ordering=('group_id', 'id') это group_id >= g AND (group_id > g OR id > i):
+    первое слагаемое даёт индексу начальную точку диапазона, и страница любой
+    глубины стоит одинаково.
+    """
+    after = Q()
+    equal = Q()
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        op = 'lt' if field.startswith('-') else 'gt'
+        after |= equal & Q(**{f'{name}__{op}': value})
+        equal &= Q(**{name: value})
+    first = ordering[0].lstrip('-')
+    bound = 'lte' if ordering[0].startswith('-') else 'gte'
+    return Q(**{f'{first}__{bound}': values[0]}) & after
+
+
+def paginate(qs, ordering: Sequence[str], limit: int, cursor: Optional[str] = None,
+             offset: int = 0, fields: Sequence[str] = None) -> Tuple[list, Optional[str]]:
+    """Страница keyset-пагинации: (объекты, next_cursor или None на последней странице).
+
+    Последний элемент ordering должен быть уникальным (обычно id). offset
+    оставлен для старых клиентов и игнорируется, если передан курсор. С fields
+    страница читается кортежами values_list(*fields) без создания моделей;
+    поля ordering должны входить в fields.
+    """
+    qs = qs.order_by(*ordering)
+    if cursor:
+        qs = qs.filter(keyset_filter(ordering, decode_cursor(cursor, ordering)))
+        offset = 0
+    if fields is not None:
+        qs = qs.values_list(*fields)
+    items = list(qs[offset:offset + limit + 1])
+    if len(items) <= limit:
+        return items, None
+    items = items[:limit]
+    last = items[-1]
+    if fields is not None:
+        values = [last[fields.index(field.lstrip('-'))] for field in ordering]
+    else:
+        values = [getattr(last, field.lstrip('-')) for field in ordering]
+    return items, encode_cursor(ordering, values)
@@ -1,7 +1,10 @@
-from django.db import transaction
+from django.db import connection, transaction
 from django.utils import timezone
 from django.db.models import Q
 from .models import ChangeSet, PersonGroup, Person, PersonHistory
+from .group_aliases import resolve_group_id
+from .pagination import paginate
+from .snapshot_service import SnapshotService
 
 
 class PersistencyService:
@@ -28,33 +31,49 @@ class PersistencyService:
         Получить историю изменений для группы по ID.
         """
         try:
-            # Получаем историю изменений для группы
-            query = PersonHistory.objects.filter(group_id=group_id).select_related('change').order_by('-valid_from')
-            
-            if limit:
-                query = query[:limit]
-                
-            history = []
-            for record in query:
-                history.append({
-                    'id': record.id,
-                    'timestamp': record.change.authored_at.isoformat() if record.change else record.valid_from.isoformat(),
-                    'author': record.change.author if record.change else 'System',
-                    'reason': record.change.reason if record.change else 'History record',
-                    'person': {
-                        'last_name': record.last_name,
-                        'first_name': record.first_name,
-                        'middle_name': record.middle_name,
-                        'full_name': f"{record.last_name} {record.first_name} {record.middle_name or ''}".strip()
-                    },
-                    'valid_from': record.valid_from.isoformat(),
-                    'valid_to': record.valid_to.isoformat()
-                })
-            
-            return history
-            
+            return PersistencyService.get_group_history_page(group_id, limit=limit)[0]
         except Exception as e:
             return []
+
+    @staticmethod
+    def get_group_history_page(group_id, limit=None, cursor=None):
+        """
+        Получить страницу истории группы (новые сначала) и курсор следующей страницы.
+        Без limit и cursor возвращается вся история.
+        """
+        try:
+            group_id = resolve_group_id(int(group_id))
+        except (TypeError, ValueError):
+            return [], None
+
+        # Получаем историю изменений для группы (кортежами, без моделей)
+        fields = ('id', 'valid_from', 'valid_to', 'last_name', 'first_name', 'middle_name',
+                  'change_id', 'change__authored_at', 'change__author', 'change__reason')
+        query = PersonHistory.objects.filter(group_id=group_id)
+        if limit or cursor:
+            records, next_cursor = paginate(query, ('-valid_from', '-id'), limit or 100, cursor, fields=fields)
+        else:
+            records, next_cursor = query.order_by('-valid_from', '-id').values_list(*fields), None
+
+        history = []
+        for (record_id, valid_from, valid_to, last_name, first_name, middle_name,
+             change_id, authored_at, author, reason) in records:
+            history.append({
+                'id': record_id,
+                'timestamp': authored_at.isoformat() if change_id else valid_from.isoformat(),
+                'author': author if change_id else 'System',
+                'reason': reason if change_id else 'History record',
+                'person': {
+                    'last_name': last_name,
+                    'first_name': first_name,
+                    'middle_name': middle_name,
+                    'full_name': f"{last_name} {first_name} {middle_name or ''}".strip()
+                },
+                'valid_from': valid_from.isoformat(),
+                'valid_to': valid_to.isoformat()
+            })
+
+        return history, next_cursor
     
     @staticmethod
     def get_group_at_time(group_id, timestamp):
@@ -62,12 +81,10 @@ class PersistencyService:
         Получить состав группы на определенное время.
         """
         try:
+            group_id = resolve_group_id(int(group_id))
+
             # Находим запись в истории, которая была активна в указанное время
-            history_record = PersonHistory.objects.filter(
-                group_id=group_id,
-                valid_from__lte=timestamp,
-                valid_to__gt=timestamp
-            ).select_related('change').first()
+            history_record = PersonHistory.valid_at(group_id, timestamp).select_related('change').first()
             
             if history_record:
                 return [{
@@ -91,6 +108,26 @@ class PersistencyService:
         except Exception as e:
             return None
     
+    @staticmethod
+    def compare_group_states(group_id, timestamp1, timestamp2):
+        """
+        Сравнить состояние группы в два момента времени.
+        Оба состояния читаются одним запросом; результат — status (added, removed,
+        changed, unchanged, absent), версии before/after и changes {поле: [было, стало]}.
+        """
+        try:
+            group_id = resolve_group_id(int(group_id))
+        except (TypeError, ValueError):
+            raise ValueError(f'Invalid group id: {group_id}')
+
+        sql, params = SnapshotService.diff_query(timestamp1, timestamp2, [group_id], changed_only=False)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+        if row is None:
+            return {'group_id': group_id, 'status': 'absent', 'before': None, 'after': None, 'changes': {}}
+        return SnapshotService.diff_row(row)
+
     @staticmethod
     def get_all_changesets(limit=None):
         """
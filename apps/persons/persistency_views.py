@@ -1,4 +1,4 @@
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
@@ -7,6 +7,9 @@ from django.utils import timezone
 from datetime import datetime
 import json
 from .persistency_service import PersistencyService
+from .snapshot_service import SnapshotService
+from .pagination import CursorError
+from .fast_json import FastJsonResponse, fast_json_enabled
 from .models import Person, PersonGroup
 
 
@@ -50,14 +53,23 @@ class GroupHistoryView(PersistencyAPIView):
             if limit:
                 limit = int(limit)
             
-            history = PersistencyService.get_group_history(group_name, limit=limit)
+            history, next_cursor = PersistencyService.get_group_history_page(
+                group_name, limit=limit, cursor=request.GET.get('cursor')
+            )
             
-            return JsonResponse({
+            response_class = FastJsonResponse if fast_json_enabled(request, 'group_history') else JsonResponse
+            return response_class({
                 'success': True,
                 'group_name': group_name,
-                'history': history
+                'history': history,
+                'next_cursor': next_cursor
             })
             
+        except CursorError as e:
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=400)
         except Exception as e:
             return JsonResponse({
                 'success': False,
@@ -301,7 +313,13 @@ class CompareGroupStatesView(PersistencyAPIView):
             
             timestamp1 = datetime.fromisoformat(timestamp1_str.replace('Z', '+00:00'))
             timestamp2 = datetime.fromisoformat(timestamp2_str.replace('Z', '+00:00'))
-            
+        except ValueError as e:
+            return JsonResponse({
+                'success': False,
+                'error': f'Invalid timestamp format: {str(e)}'
+            }, status=400)
+
+        try:
             comparison = PersistencyService.compare_group_states(
                 group_name, timestamp1, timestamp2
             )
@@ -317,7 +335,7 @@ class CompareGroupStatesView(PersistencyAPIView):
         except ValueError as e:
             return JsonResponse({
                 'success': False,
-                'error': f'Invalid timestamp format: {str(e)}'
+                'error': str(e)
             }, status=400)
         except Exception as e:
             return JsonResponse({
@@ -326,6 +344,36 @@ class CompareGroupStatesView(PersistencyAPIView):
             }, status=500)
 
 
+class DatasetChangesView(PersistencyAPIView):
+    """
+    API endpoint изменений всего реестра между двумя моментами (NDJSON-поток).
+    GET /api/persistency/changes.ndjson?timestamp1=<iso>&timestamp2=<iso>
+    Строка на изменившуюся группу: group_id, status, before, after, changes.
+    """
+    
+    def get(self, request):
+        timestamp1_str = request.GET.get('timestamp1')
+        timestamp2_str = request.GET.get('timestamp2')
+        if not timestamp1_str or not timestamp2_str:
+            return JsonResponse({
+                'success': False,
+                'error': 'Both timestamp1 and timestamp2 parameters are required'
+            }, status=400)
+        try:
+            timestamp1 = datetime.fromisoformat(timestamp1_str.replace('Z', '+00:00'))
+            timestamp2 = datetime.fromisoformat(timestamp2_str.replace('Z', '+00:00'))
+        except ValueError as e:
+            return JsonResponse({
+                'success': False,
+                'error': f'Invalid timestamp format: {str(e)}'
+            }, status=400)
+
+        return StreamingHttpResponse(
+            SnapshotService.iter_diff_jsonl(timestamp1, timestamp2),
+            content_type='application/x-ndjson; charset=utf-8'
+        )
+
+
 class PersonHistoryView(PersistencyAPIView):
     """
     API endpoint для получения истории участия человека в группах.
@@ -361,14 +409,23 @@ class GroupHistoryByIdView(PersistencyAPIView):
             if limit:
                 limit = int(limit)
             
-            history = PersistencyService.get_group_history(group_id, limit=limit)
+            history, next_cursor = PersistencyService.get_group_history_page(
+                group_id, limit=limit, cursor=request.GET.get('cursor')
+            )
             
-            return JsonResponse({
+            response_class = FastJsonResponse if fast_json_enabled(request, 'group_history') else JsonResponse
+            return response_class({
                 'success': True,
                 'group_id': group_id,
-                'history': history
+                'history': history,
+                'next_cursor': next_cursor
             })
             
+        except CursorError as e:
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=400)
         except Exception as e:
             return JsonResponse({
                 'success': False,
@@ -0,0 +1,40 @@
+import re
+from typing import Optional
+
+# Гласные сводятся к трём классам (безударные о/а, е/и/э и ы/я звучат близко)
+_VOWEL_GROUPS = (('ЙО', 'И'), ('ИО', 'И'), ('ЙЕ', 'И'), ('ИЕ', 'И'), ('ИЯ', 'Я'))
+_VOWELS = str.maketrans({'О': 'А', 'Ы': 'А', 'Я': 'А', 'Е': 'И', 'Ё': 'И', 'Э': 'И', 'Й': 'И', 'Ю': 'У'})
+# Звонкие согласные оглушаются в конце слова и перед глухими
+_DEVOICE = {'Б': 'П', 'В': 'Ф', 'Г': 'К', 'Д': 'Т', 'Ж': 'Ш', 'З': 'С'}
+_VOICELESS = set('ПФКТШСХЦЧЩ')
+_SOUNDS = (('ТС', 'Ц'), ('ДС', 'Ц'), ('Щ', 'Ш'))
+
+
+def russian_metaphone(name: Optional[str]) -> Optional[str]:
+    """Фонетический ключ русского имени или фамилии (упрощённый «русский метафон»).
+
+    Одинаково звучащие написания дают один ключ: Иванов/Иваноф -> ИВАНАФ,
+    Щербаков/Шербаков -> ШИРБАКАФ. Не-кириллица отбрасывается.
+    """
+    if not name:
+        return None
+    word = re.sub(r'[^А-Я]', '', name.upper().replace('Ё', 'Е'))
+    word = word.replace('Ъ', '').replace('Ь', '')
+    if not word:
+        return None
+
+    for group, replacement in _VOWEL_GROUPS:
+        word = word.replace(group, replacement)
+    word = word.translate(_VOWELS)
+
+    chars = list(word)
+    for i in range(len(chars) - 1, -1, -1):
+        following = chars[i + 1] if i + 1 < len(chars) else None
+        if chars[i] in _DEVOICE and (following is None or following in _VOICELESS):
+            chars[i] = _DEVOICE[chars[i]]
+    word = ''.join(chars)
+
+    for sound, replacement in _SOUNDS:
+        word = word.replace(sound, replacement)
+    # Удвоенные буквы звучат как одна
+    return re.sub(r'(.)\1+', r'\1', word)
@@ -0,0 +1,287 @@
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from django.db import connection, transaction
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Any
+
+from .checkpoint_service import CheckpointService
+from .dedup_index import DedupIndex, get_dedup_index
+from .models import Person, PersonGroup
+from .services import PersonService
+from .union_find import UnionFind
+from .vitrine import VitrineService
+
+
+# id, group_id, address_key, phone_key, email_key
+PartitionRow = Tuple[int, Optional[int], str, Optional[str], Optional[str]]
+
+
+def cluster_partitions(partitions: List[List[PartitionRow]]) -> List[List[List[Tuple[int, Optional[int]]]]]:
+    """Кластеризация партиций (выполняется в процессе пула, без обращения к базе).
+
+    Внутри партиции (один ключ блокировки) люди связываются по совпадению
+    нормализованного ключа адреса, телефона или email. Для каждой партиции возвращаются кластеры — списки
+    (person_id, текущий group_id).
+    """
+    result = []
+    for rows in partitions:
+        uf = UnionFind()
+        first_seen = {}
+        for person_id, _, address_key, phone_key, email_key in rows:
+            uf.add(person_id)
+            for contact in (('a', address_key), ('p', phone_key), ('e', email_key)):
+                if not contact[1]:
+                    continue
+                other = first_seen.setdefault(contact, person_id)
+                if other != person_id:
+                    uf.union(other, person_id)
+        current = {person_id: group_id for person_id, group_id, _, _, _ in rows}
+        result.append([
+            [(person_id, current[person_id]) for person_id in sorted(members)]
+            for members in uf.groups().values()
+        ])
+    return result
+
+
+class GroupBitmap:
+    """Множество занятых id групп в виде битовой карты (память ~ max_id / 8 байт)"""
+
+    def __init__(self):
+        self._bits = bytearray()
+
+    def __contains__(self, group_id: int) -> bool:
+        byte = group_id >> 3
+        return byte < len(self._bits) and bool(self._bits[byte] & (1 << (group_id & 7)))
+
+    def add(self, group_id: int):
+        byte = group_id >> 3
+        if byte >= len(self._bits):
+            self._bits.extend(bytes(byte - len(self._bits) + 1 + len(self._bits) // 2))
+        self._bits[byte] |= 1 << (group_id & 7)
+
+
+class RededupService:
+    """Полная передедупликация таблицы person по текущим правилам сопоставления.
+
+    Люди читаются серверным курсором в порядке ключа блокировки, режутся на партиции
+    (один ключ — одна партиция) и кластеризуются union-find в пуле процессов.
+    Каждый кластер получает минимальную из своих групп, ещё не занятую другим
+    кластером, иначе — новую группу. Перемещения пишутся пачками во временную
+    таблицу и применяются в конце под одним набором изменений. На время прогона
+    (кроме dry_run) запись в person блокируется.
+    """
+
+    FIELDS = ('id', 'group_id', 'gender', 'first_name', 'middle_name', 'last_name',
+              'address_key', 'phone_key', 'email_key')
+
+    def __init__(self, workers: int = None, chunk_rows: int = 20000, dry_run: bool = False,
+                 on_move: Callable[[int, Optional[int], Any], None] = None,
+                 progress: Callable[[Dict[str, Any]], None] = None):
+        self.workers = workers or multiprocessing.cpu_count()
+        self.chunk_rows = chunk_rows
+        self.dry_run = dry_run
+        self.on_move = on_move
+        self.progress = progress
+        self.claimed = GroupBitmap()
+        self.stats = {'rows': 0, 'partitions': 0, 'clusters': 0, 'moved': 0, 'new_groups': 0}
+        self._moves = []
+        self._new_groups = 0
+        self._started = None
+
+    def _iter_partitions(self) -> Iterator[List[PartitionRow]]:
+        rows = (
+            Person.objects
+            .order_by('gender', 'first_name', 'middle_name', 'last_name', 'id')
+            .values_list(*self.FIELDS)
+            .iterator(chunk_size=self.chunk_rows)
+        )
+        current_key = None
+        partition = []
+        for person_id, group_id, gender, first_name, middle_name, last_name, address_key, phone_key, email_key in rows:
+            key = PersonService.blocking_key({
+                'gender': gender, 'first_name': first_name,
+                'middle_name': middle_name, 'last_name': last_name,
+            })
+            if key != current_key and partition:
+                yield partition
+                partition = []
+            current_key = key
+            partition.append((person_id, group_id, address_key, phone_key, email_key))
+        if partition:
+            yield partition
+
+    def _iter_chunks(self) -> Iterator[List[List[PartitionRow]]]:
+        """Мелкие партиции объединяются в задания по ~chunk_rows строк"""
+        chunk, size = [], 0
+        for partition in self._iter_partitions():
+            chunk.append(partition)
+            size += len(partition)
+            self.stats['rows'] += len(partition)
+            self.stats['partitions'] += 1
+            if size >= self.chunk_rows:
+                yield chunk
+                chunk, size = [], 0
+        if chunk:
+            yield chunk
+
+    def _assign(self, clusters: List[List[Tuple[int, Optional[int]]]]):
+        """Назначение групп кластерам одного задания"""
+        for cluster in clusters:
+            self.stats['clusters'] += 1
+            target = next(
+                (group_id for group_id in sorted({g for _, g in cluster if g is not None})
+                 if group_id not in self.claimed),
+                None,
+            )
+            if target is None:
+                # Кластер отделился от групп, занятых другими кластерами
+                self._new_groups += 1
+                self.stats['new_groups'] += 1
+                target = -self._new_groups
+            else:
+                self.claimed.add(target)
+            for person_id, group_id in cluster:
+                if group_id != target:
+                    self._moves.append((person_id, group_id, target))
+
+    def _flush(self, cursor):
+        if not self._moves:
+            return
+        if self.dry_run:
+            if self.on_move:
+                for person_id, group_id, target in self._moves:
+                    self.on_move(person_id, group_id, target if target > 0 else f'new #{-target}')
+        else:
+            placeholders = sorted({-target for _, _, target in self._moves if target < 0})
+            new_ids = {}
+            if placeholders:
+                created = PersonGroup.objects.bulk_create([PersonGroup() for _ in placeholders])
+                new_ids = {number: group.id for number, group in zip(placeholders, created)}
+            moves = [(person_id, group_id, target if target > 0 else new_ids[-target])
+                     for person_id, group_id, target in self._moves]
+            cursor.execute(
+                """
+                INSERT INTO rededup_moves (person_id, old_group, new_group)
+                SELECT * FROM unnest(%s::int[], %s::int[], %s::int[])
+                """,
+                [[m[0] for m in moves], [m[1] for m in moves], [m[2] for m in moves]],
+            )
+        self.stats['moved'] += len(self._moves)
+        self._moves = []
+
+    def _report(self):
+        if self.progress:
+            elapsed = time.monotonic() - self._started
+            self.progress({
+                **self.stats,
+                'elapsed_seconds': round(elapsed, 1),
+                'rows_per_sec': round(self.stats['rows'] / elapsed, 1) if elapsed > 0 else None,
+            })
+
+    def run(self, author: str = 'system') -> Dict[str, Any]:
+        self._started = time.monotonic()
+        # fork: дочерним процессам не нужна настройка Django, они не ходят в базу
+        context = multiprocessing.get_context('fork')
+        if connection.in_atomic_block:
+            raise RuntimeError('Re-deduplication forks worker processes and must not run inside a transaction')
+        # Процессы пула создаются до транзакции и серверного курсора, при закрытом
+        # соединении — дочерние процессы не наследуют его сокет
+        connection.close()
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=context) as pool:
+            # Пул с fork запускает все процессы при первом задании
+            pool.submit(cluster_partitions, []).result()
+
+            with transaction.atomic(), connection.cursor() as cursor:
+                if not self.dry_run:
+                    # Запись людей (create_person, пачки, очередь, админка) ждёт коммита:
+                    # иначе человек, добавленный после чтения, остался бы в переписанной группе.
+                    # Чтение не блокируется; режим исключает и второй параллельный запуск
+                    cursor.execute("LOCK TABLE person IN SHARE ROW EXCLUSIVE MODE")
+                    cursor.execute(
+                        "CREATE TEMP TABLE rededup_moves "
+                        "(person_id INT PRIMARY KEY, old_group INT, new_group INT NOT NULL) ON COMMIT DROP"
+                    )
+
+                # Не больше 2 заданий на процесс в полёте — память ограничена
+                in_flight = deque()
+                for chunk in self._iter_chunks():
+                    in_flight.append(pool.submit(cluster_partitions, chunk))
+                    if len(in_flight) >= self.workers * 2:
+                        for clusters in in_flight.popleft().result():
+                            self._assign(clusters)
+                        self._flush(cursor)
+                        self._report()
+                while in_flight:
+                    for clusters in in_flight.popleft().result():
+                        self._assign(clusters)
+                    self._flush(cursor)
+                self._report()
+
+                if self.dry_run or not self.stats['moved']:
+                    return self.stats
+
+                change_set = PersonService.create_change_set(
+                    author=author,
+                    reason=f"Re-deduplication: {self.stats['moved']} persons regrouped"
+                )
+                self._apply(cursor, change_set)
+        return self.stats
+
+    def _apply(self, cursor, change_set):
+        """Применение перемещений одним набором изменений"""
+        cursor.execute(
+            """
+            UPDATE person p SET group_id = m.new_group
+            FROM rededup_moves m
+            WHERE p.id = m.person_id
+            """
+        )
+        # Группы, целиком ушедшие в одну группу: история переезжает, старый id становится алиасом
+        cursor.execute(
+            """
+            CREATE TEMP TABLE rededup_absorbed ON COMMIT DROP AS
+            SELECT m.old_group, MIN(m.new_group) AS new_group
+            FROM rededup_moves m
+            WHERE m.old_group IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM person p WHERE p.group_id = m.old_group)
+            GROUP BY m.old_group
+            HAVING COUNT(DISTINCT m.new_group) = 1
+            """
+        )
+        cursor.execute(
+            """
+            UPDATE person_history h SET group_id = a.new_group
+            FROM rededup_absorbed a
+            WHERE h.group_id = a.old_group
+            """
+        )
+        cursor.execute(
+            """
+            UPDATE person_group_alias al SET target_id = a.new_group
+            FROM rededup_absorbed a
+            WHERE al.target_id = a.old_group
+            """
+        )
+        cursor.execute(
+            """
+            INSERT INTO person_group_alias (group_id, target_id, change_id)
+            SELECT old_group, new_group, %s FROM rededup_absorbed
+            ON CONFLICT (group_id) DO UPDATE
+              SET target_id = EXCLUDED.target_id, change_id = EXCLUDED.change_id
+            """,
+            [change_set.id],
+        )
+        VitrineService.refresh_groups_sql(
+            "SELECT old_group FROM rededup_moves WHERE old_group IS NOT NULL "
+            "UNION SELECT new_group FROM rededup_moves",
+            [],
+        )
+        # Версии переехали между группами — строки контрольных точек, индексы дедупликации
+        # воркеров и закэшированные результаты поиска больше не верны
+        CheckpointService.invalidate()
+        DedupIndex.bump_generation()
+        index = get_dedup_index()
+        if index is not None:
+            transaction.on_commit(index.invalidate)
+        PersonService.invalidate_search_cache()
@@ -0,0 +1,143 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from typing import Any, Callable, Dict, Optional
+
+# Число строк-слотов search_data_version (см. sqlScript.sql)
+VERSION_SLOTS = 16
+# Увеличение версии данных; параметр — VERSION_SLOTS
+BUMP_VERSION_SQL = "UPDATE search_data_version SET version = version + 1 WHERE slot = pg_backend_pid() %% %s"
+
+class SearchCache:
+    """Кэш результатов поиска по витрине.
+
+    Ключ — нормализованные параметры поиска. Записи помечены версией данных
+    (счётчик search_data_version, его увеличивает каждая транзакция записи —
+    bump_version): любая закоммиченная запись делает их устаревшими. Версия
+    перечитывается не чаще version_check секунд, собственные записи процесса
+    сбрасывают кэш сразу (mark_stale). Первый уровень — LRU в памяти процесса,
+    второй (необязательный) — общий кэш Django (база или файлы).
+    """
+
+    def __init__(self, max_entries: int = 1000, version_check: float = 1.0,
+                 shared_alias: str = '', shared_timeout: int = 300):
+        self.max_entries = max_entries
+        self.version_check = version_check
+        self.shared = caches[shared_alias] if shared_alias else None
+        self.shared_timeout = shared_timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self._version_checked = 0.0
+        self._counters = {'hits': 0, 'shared_hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+    @staticmethod
+    def make_key(params: Dict[str, Any]) -> str:
+        """Ключ параметров: пустые значения отброшены, порядок не важен"""
+        normalized = {k: v for k, v in params.items() if v not in (None, '')}
+        raw = json.dumps(normalized, sort_keys=True, default=str, ensure_ascii=False)
+        return hashlib.blake2b(raw.encode('utf-8'), digest_size=16).hexdigest()
+
+    @staticmethod
+    def bump_version():
+        """Увеличить версию данных в текущей транзакции записи (видна после коммита).
+
+        Вызывается последним запросом транзакции: блокировка строки слота держится
+        только до коммита. Слот выбирается по процессу сервера, так что параллельные
+        транзакции обычно блокируют разные строки.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(BUMP_VERSION_SQL, [VERSION_SLOTS])
+
+    def data_version(self) -> int:
+        """Текущая версия данных (сумма счётчиков search_data_version)"""
+        now = time.monotonic()
+        if self._version is None or now - self._version_checked >= self.version_check:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT COALESCE(SUM(version), 0) FROM search_data_version")
+                version = cursor.fetchone()[0]
+            with self._lock:
+                if version != self._version:
+                    if self._entries:
+                        self._counters['invalidations'] += 1
+                    self._entries.clear()
+                    self._version = version
+                self._version_checked = now
+        return self._version
+
+    def mark_stale(self):
+        """Сбросить записи процесса и перечитать версию при следующем обращении (после записи)"""
+        with self._lock:
+            if self._entries:
+                self._counters['invalidations'] += 1
+            self._entries.clear()
+            # Результат, который считается сейчас, не попадёт в кэш (версия не совпадёт)
+            self._version = None
+            self._version_checked = 0.0
+
+    def get_or_compute(self, params: Dict[str, Any], compute: Callable[[], Any]) -> Any:
+        version = self.data_version()
+        key = self.make_key(params)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._counters['hits'] += 1
+                return self._entries[key]
+
+        shared_key = f'persons:search:{version}:{key}'
+        value = self.shared.get(shared_key) if self.shared is not None else None
+        if value is not None:
+            self._counters['shared_hits'] += 1
+        else:
+            self._counters['misses'] += 1
+            value = compute()
+            if self.shared is not None:
+                self.shared.set(shared_key, value, self.shared_timeout)
+
+        with self._lock:
+            # Версия могла смениться, пока считали — такой результат не кэшируем
+            if version == self._version:
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self._counters['evictions'] += 1
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._counters['hits'] + self._counters['shared_hits'] + self._counters['misses']
+            return {
+                **self._counters,
+                'hit_ratio': round((lookups - self._counters['misses']) / lookups, 4) if lookups else None,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'data_version': self._version,
+                'shared': self.shared is not None,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_search_cache() -> Optional[SearchCache]:
+    """Кэш процесса, если он включён (PERSONS_SEARCH_CACHE_SIZE > 0)"""
+    global _cache
+    if settings.PERSONS_SEARCH_CACHE_SIZE <= 0:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SearchCache(
+                    max_entries=settings.PERSONS_SEARCH_CACHE_SIZE,
+                    version_check=settings.PERSONS_SEARCH_CACHE_VERSION_CHECK,
+                    shared_alias=settings.PERSONS_SEARCH_CACHE_SHARED,
+                    shared_timeout=settings.PERSONS_SEARCH_CACHE_TIMEOUT,
+                )
+    return _cache
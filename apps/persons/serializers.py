@@ -3,7 +3,47 @@ from .models import Person, PersonGroup, ChangeSet
 from datetime import datetime
 
 
-class PersonSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    """Выходной сериализатор с подмножеством полей: Serializer(..., fields=('group_id', ...))"""
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class FieldsetField(serializers.CharField):
+    """Параметр fields=a,b,c: имена проверяются по полям выходного сериализатора"""
+
+    def __init__(self, allowed, **kwargs):
+        self.allowed = tuple(allowed)
+        kwargs.setdefault('required', False)
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        names = [name.strip() for name in super().to_internal_value(data).split(',') if name.strip()]
+        unknown = [name for name in names if name not in self.allowed]
+        if unknown:
+            raise serializers.ValidationError(
+                f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(self.allowed)}"
+            )
+        if not names:
+            raise serializers.ValidationError('At least one field is required')
+        # Порядок полей — как в выходном сериализаторе
+        return tuple(name for name in self.allowed if name in names)
+
+
+class FieldsetQueryMixin:
+    """Параметры запроса с fields=; допустимые имена даёт fieldset_names()"""
+
+    def get_fields(self):
+        fields = super().get_fields()
+        fields['fields'] = FieldsetField(allowed=self.fieldset_names())
+        return fields
+
+
+class PersonSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Сериализатор для работы с Person через API"""
     
     class Meta:
@@ -76,19 +116,41 @@ class PersonSerializer(serializers.ModelSerializer):
         return value
 
 
-class PersonSearchSerializer(serializers.Serializer):
+class PersonSearchSerializer(FieldsetQueryMixin, serializers.Serializer):
     """Сериализатор для поиска людей"""
     last_name = serializers.CharField(required=False, allow_blank=True)
     first_name = serializers.CharField(required=False, allow_blank=True)
     middle_name = serializers.CharField(required=False, allow_blank=True)
     address = serializers.CharField(required=False, allow_blank=True)
     phone = serializers.CharField(required=False, allow_blank=True)
+    phone_match = serializers.ChoiceField(choices=['auto', 'prefix', 'suffix'], default='auto')
     email = serializers.CharField(required=False, allow_blank=True)
+    q = serializers.CharField(required=False, allow_blank=True, max_length=500)
+    mode = serializers.ChoiceField(choices=['trigram', 'contains'], default='trigram')
+    phonetic = serializers.BooleanField(default=False)
+    ordering = serializers.ChoiceField(choices=['group_id', 'similarity', 'rank'], required=False)
     limit = serializers.IntegerField(default=100, min_value=1, max_value=1000)
     offset = serializers.IntegerField(default=0, min_value=0)
+    cursor = serializers.CharField(required=False, allow_blank=True)
+
+    def fieldset_names(self):
+        return list(PersonVitrineSerializer().fields)
+
+
+class PageSerializer(serializers.Serializer):
+    """Параметры страницы для списков с курсорной пагинацией"""
+    limit = serializers.IntegerField(default=100, min_value=1, max_value=1000)
+    cursor = serializers.CharField(required=False, allow_blank=True)
+
+
+class PersonListQuerySerializer(FieldsetQueryMixin, PageSerializer):
+    """Параметры списка людей: страница и необязательный fields="""
+
+    def fieldset_names(self):
+        return list(PersonSerializer.Meta.fields)
 
 
-class PersonVitrineSerializer(serializers.Serializer):
+class PersonVitrineSerializer(SparseFieldsMixin, serializers.Serializer):
     """Сериализатор для витрины (результатов поиска)"""
     group_id = serializers.IntegerField()
     last_name = serializers.CharField()
@@ -1,8 +1,36 @@
+import hashlib
+import re
+from django.conf import settings
 from django.db import connection, transaction
-from django.db.models import Q
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVectorField, TrigramSimilarity
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import Cast, Reverse
+from django.db.models.expressions import RawSQL
 from django.utils import timezone
-from .models import Person, PersonGroup, ChangeSet, PersonHistory
-from typing import Optional, List, Dict, Any
+from .models import Person, PersonGroupAlias, ChangeSet, PersonHistory, GroupVitrine
+from .dedup_index import get_dedup_index
+from .group_aliases import get_group_resolver, resolve_group_id
+from .union_find import UnionFind
+from .pagination import paginate
+from .vitrine import VitrineService
+from .search_cache import BUMP_VERSION_SQL, VERSION_SLOTS, get_search_cache
+from .fast_json import RowLayout
+from .normalization import normalize_phone_key, normalize_email_key, normalize_address_key
+from .phonetics import russian_metaphone
+from typing import Optional, List, Dict, Any, Tuple
+
+
+# Конфигурация текстового поиска столбца group_vitrine.address_tsv (см. sqlScript.sql)
+ADDRESS_SEARCH_CONFIG = 'russian'
+
+# Раскладки values_list -> ключи ответа (без создания моделей)
+VITRINE_LAYOUT = RowLayout(('group_id', 'last_name', 'first_name', 'middle_name', 'birth_date',
+                            'gender', 'address', 'phone', 'email'))
+PERSON_LAYOUT = RowLayout(('id', 'group_id', 'last_name', 'first_name', 'middle_name', 'birth_date',
+                           'gender', 'address', 'phone', 'email', 'created_at', 'is_current'))
+
+# Строковый литерал (оставляется как есть) или однострочный комментарий SQL
+_SQL_COMMENT_RE = re.compile(r"('(?:[^']|'')*')|--[^\n]*")
 
 
 class PersonService:
@@ -10,21 +38,48 @@ class PersonService:
 
     @staticmethod
     def create_change_set(author: str = None, reason: str = None) -> ChangeSet:
-        """Создание нового набора изменений"""
+        """Создание нового набора изменений.
+
+        Версию кэша поиска увеличивает вызывающий последним запросом транзакции
+        (invalidate_search_cache), чтобы блокировка слота не держалась всю запись.
+        """
         return ChangeSet.objects.create(author=author, reason=reason)
 
+    @staticmethod
+    def invalidate_search_cache():
+        """Увеличить версию данных в конце транзакции записи; после коммита кэш процесса сбрасывается"""
+        cache = get_search_cache()
+        if cache is not None:
+            cache.bump_version()
+            transaction.on_commit(cache.mark_stale)
+
     @staticmethod
     def find_matching_group(person_data: Dict[str, Any]) -> Optional[int]:
-        """Поиск подходящей группы для человека (бэкенд-реализация без SQL-функций).
+        """Поиск подходящей группы для человека (минимальная из совпавших)"""
+        groups = PersonService.find_matching_groups(person_data)
+        return groups[0] if groups else None
+
+    @staticmethod
+    def find_matching_groups(person_data: Dict[str, Any]) -> List[int]:
+        """Поиск всех подходящих групп для человека (бэкенд-реализация без SQL-функций).
 
         Условия (все должны выполняться):
         - Совпадение пола
         - Полное совпадение имён
         - Полное совпадение отчеств (оба NULL или равны)
         - Для мужчин — полное совпадение фамилий
-        - Совпадение хотя бы одного контакта: address ИЛИ phone (если указан) ИЛИ email (если указан)
+        - Совпадение хотя бы одного контакта: address ИЛИ phone (если указан) ИЛИ email (если указан),
+          сравниваются нормализованные ключи (телефон — цифры, email — нижний регистр, адрес — канонический)
         Смотрим по всем записям (все актуальны для своего времени).
+        Если включён индекс дедупликации (PERSONS_DEDUP_INDEX), поиск идёт по нему.
+        Возвращает актуальные (с учётом слияний) id групп по возрастанию; больше одной
+        группы означает, что запись связывает несколько групп и их нужно слить.
         """
+        index = get_dedup_index()
+        if index is not None:
+            PersonService.catch_up_dedup_index(index)
+            return index.find_matching_groups(person_data, refresh=False)
+
         qs = Person.objects.filter(
             gender=person_data['gender'],
             first_name=person_data['first_name'],
@@ -39,192 +94,517 @@ class PersonService:
         if person_data['gender'] == 'М':
             qs = qs.filter(last_name=person_data['last_name'])
 
-        contact_q = Q(address=person_data['address'])
-        phone = person_data.get('phone')
-        email = person_data.get('email')
-        if phone:
-            contact_q |= Q(phone=phone)
-        if email:
-            contact_q |= Q(email=email)
+        # Контакты сравниваются по нормализованным ключам (индексы i_person_*_key)
+        contact_q = Q()
+        for field, key in PersonService.contact_keys(person_data):
+            contact_q |= Q(**{field: key})
 
-        group_id = (
+        group_ids = (
             qs.filter(contact_q)
               .order_by('group_id')
               .values_list('group_id', flat=True)
-              .first()
+              .distinct()
         )
-        return int(group_id) if group_id is not None else None
+        return sorted({resolve_group_id(group_id) for group_id in group_ids if group_id is not None})
 
     @staticmethod
-    @transaction.atomic
-    def create_person(person_data: Dict[str, Any], change_set: ChangeSet = None) -> Person:
-        """Создание нового человека с дедупликацией"""
-        if not change_set:
-            change_set = PersonService.create_change_set(
-                author='system',
-                reason='API person creation'
+    def merge_groups(target_id: int, group_ids: List[int], change_set: ChangeSet):
+        """Слияние групп group_ids в target_id под набором изменений.
+
+        Версии людей и история переносятся в target_id, а старые id записываются
+        в person_group_alias, чтобы по ним по-прежнему находилась слитая группа.
+        """
+        group_ids = [group_id for group_id in group_ids if group_id != target_id]
+        if not group_ids:
+            return
+        Person.objects.filter(group_id__in=group_ids).update(group_id=target_id)
+        PersonHistory.objects.filter(group_id__in=group_ids).update(group_id=target_id)
+        # Цепочки не растут: всё, что указывало на слитые группы, указывает на target_id
+        PersonGroupAlias.objects.filter(target_id__in=group_ids).update(target_id=target_id)
+        PersonGroupAlias.objects.bulk_create(
+            [PersonGroupAlias(group_id=group_id, target_id=target_id, change=change_set)
+             for group_id in group_ids],
+            update_conflicts=True,
+            unique_fields=['group'],
+            update_fields=['target', 'change'],
+        )
+        VitrineService.refresh_groups([target_id] + group_ids)
+
+        # Индекс дедупликации не перестраивается: слитые id из него разрешаются
+        # через алиасы при пробе (resolve_group_id)
+        resolver = get_group_resolver()
+        transaction.on_commit(lambda: [resolver.add(group_id, target_id) for group_id in group_ids])
+
+    @staticmethod
+    def blocking_key(person_data: Dict[str, Any]) -> tuple:
+        """Ключ блокировки: пол, имя, отчество и фамилия (только для мужчин)"""
+        return (
+            person_data['gender'],
+            person_data['first_name'],
+            person_data.get('middle_name'),
+            person_data['last_name'] if person_data['gender'] == 'М' else None,
+        )
+
+    @staticmethod
+    def contact_keys(person_data: Dict[str, Any]) -> List[tuple]:
+        """Нормализованные ключи контактов, по которым возможно совпадение: адрес, телефон и email"""
+        keys = (
+            ('address_key', normalize_address_key(person_data.get('address'))),
+            ('phone_key', normalize_phone_key(person_data.get('phone'))),
+            ('email_key', normalize_email_key(person_data.get('email'))),
+        )
+        return [(field, key) for field, key in keys if key]
+
+    @staticmethod
+    def blocking_lock_id(person_data: Dict[str, Any]) -> int:
+        """64-битный идентификатор advisory-блокировки для ключа блокировки.
+
+        Хэш стабилен между процессами (в отличие от встроенного hash()).
+        """
+        raw = '\x1f'.join(part or '' for part in PersonService.blocking_key(person_data))
+        digest = hashlib.blake2b(raw.encode('utf-8'), digest_size=8).digest()
+        return int.from_bytes(digest, 'big', signed=True)
+
+    @staticmethod
+    def lock_blocking_keys(rows: List[Dict[str, Any]]):
+        """Транзакционные advisory-блокировки на ключи блокировки записей.
+
+        Сериализует «поиск группы + вставку» только для людей с одинаковым ключом,
+        остальные вставки идут параллельно. Блокировки берутся в порядке возрастания
+        id, чтобы пачки не могли взаимно заблокироваться, и снимаются при коммите.
+        """
+        lock_ids = sorted({PersonService.blocking_lock_id(row) for row in rows})
+        if not lock_ids:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT pg_advisory_xact_lock(s.k)
+                FROM (SELECT k FROM unnest(%s::bigint[]) AS k ORDER BY k) AS s
+                """,
+                [lock_ids],
             )
 
-        # Поиск группы бэкендом
-        group_id = PersonService.find_matching_group(person_data)
-        if group_id:
-            group = PersonGroup.objects.get(id=group_id)
-        else:
-            group = PersonGroup.objects.create()
+    @staticmethod
+    def catch_up_dedup_index(index):
+        """Догрузка индекса дедупликации перед поиском для записи (пачки записей).
 
-        # Создание новой «текущей» версии человека
-        now_ts = timezone.now()
-        
-        # Создаем объект с валидацией
+        Под advisory-блокировками ключей (PERSONS_DEDUP_LOCKING) индекс догружается всегда:
+        иначе запись, закоммиченная другим воркером до взятия блокировки, не будет видна.
+        Без блокировок — не чаще PERSONS_DEDUP_INDEX_REFRESH секунд.
+        """
+        index.catch_up(force=settings.PERSONS_DEDUP_LOCKING)
+
+    @staticmethod
+    def find_matching_groups_bulk(rows: List[Dict[str, Any]]) -> Dict[int, List[int]]:
+        """Поиск групп для N записей одним запросом.
+
+        Список записей разворачивается через unnest и соединяется с person по ключу
+        блокировки и контактам. Возвращает {номер записи: совпавшие group_id по
+        возрастанию} только для записей, у которых нашлось совпадение.
+        """
+        if not rows:
+            return {}
+
+        index = get_dedup_index()
+        if index is not None:
+            # Одна догрузка на пачку, дальше — только пробы словаря
+            PersonService.catch_up_dedup_index(index)
+            matches = {}
+            for i, row in enumerate(rows):
+                group_ids = index.find_matching_groups(row, refresh=False)
+                if group_ids:
+                    matches[i] = group_ids
+            return matches
+
+        params = [list(range(len(rows)))]
+        params += [[row.get(column) for row in rows]
+                   for column in ('gender', 'first_name', 'middle_name', 'last_name')]
+        params += [[normalize_address_key(row.get('address')) for row in rows],
+                   [normalize_phone_key(row.get('phone')) for row in rows],
+                   [normalize_email_key(row.get('email')) for row in rows]]
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT v.ord, array_agg(DISTINCT p.group_id)
+                FROM unnest(%s::int[], %s::text[], %s::text[], %s::text[], %s::text[],
+                            %s::text[], %s::text[], %s::text[])
+                     AS v(ord, gender, first_name, middle_name, last_name,
+                          address_key, phone_key, email_key)
+                JOIN person p
+                  ON p.gender = v.gender
+                 AND p.first_name = v.first_name
+                 AND p.middle_name IS NOT DISTINCT FROM v.middle_name
+                 AND (v.gender <> 'М' OR p.last_name = v.last_name)
+                 AND (p.address_key = v.address_key
+                      OR p.phone_key = v.phone_key
+                      OR p.email_key = v.email_key)
+                GROUP BY v.ord
+                """,
+                params,
+            )
+            return {
+                ord_: sorted({resolve_group_id(group_id) for group_id in group_ids if group_id is not None})
+                for ord_, group_ids in cursor.fetchall()
+            }
+
+    @staticmethod
+    def resolve_groups(rows: List[Dict[str, Any]]) -> Tuple[List[int], Dict[int, List[int]]]:
+        """Разрешение групп для пачки записей так же, как при последовательных create_person.
+
+        Возвращает пару:
+        - по элементу на запись: id существующей группы или отрицательный номер новой
+          группы (-1, -2, ...) в порядке создания;
+        - слияния {целевая группа: [сливаемые существующие группы]}.
+        Записи пачки, совпадающие между собой, попадают в одну группу; запись, связывающая
+        несколько групп (существующих или новых), сливает их в минимальную.
+        """
+        db_matches = PersonService.find_matching_groups_bulk(rows)
+
+        # Существующие группы (0, id) предшествуют новым (1, n): при одиночной вставке
+        # новые группы получают id больше любых существующих
+        uf = UnionFind()
+        buckets = {}
+        labels = []
+        new_groups = 0
+        for i, row in enumerate(rows):
+            bucket = buckets.setdefault(PersonService.blocking_key(row), {})
+            contacts = PersonService.contact_keys(row)
+            candidates = [bucket[c] for c in contacts if c in bucket]
+            candidates += [(0, group_id) for group_id in db_matches.get(i, [])]
+            if candidates:
+                group = uf.union_all(candidates)
+            else:
+                new_groups += 1
+                group = (1, new_groups)
+                uf.add(group)
+            for contact in contacts:
+                bucket.setdefault(contact, group)
+            labels.append(group)
+
+        # Новые группы, слитые с другими, пропадают — нумеруем оставшиеся подряд
+        new_numbers = {}
+        resolved = []
+        for label in labels:
+            kind, number = uf.find(label)
+            if kind == 0:
+                resolved.append(number)
+            else:
+                resolved.append(-new_numbers.setdefault(number, len(new_numbers) + 1))
+
+        merges = {}
+        for (kind, number), members in uf.groups().items():
+            others = [group_id for member_kind, group_id in members
+                      if member_kind == 0 and group_id != number]
+            if kind == 0 and others:
+                merges[number] = sorted(others)
+        return resolved, merges
+
+    @staticmethod
+    @transaction.atomic
+    def create_person(person_data: Dict[str, Any], change_set: ChangeSet = None) -> Person:
+        """Создание нового человека с дедупликацией.
+
+        Запись идёт не больше чем в два обращения к базе: поиск группы (или проба
+        индекса дедупликации) и один запрос write_person_version. Блокировка
+        ключа и слияние групп добавляют запросы, только когда они включены/нужны.
+        """
+        # Создаем объект с валидацией (включая форматирование телефона) до обращений к базе
         person = Person(
-            group=group,
-            change=change_set,
-            created_at=now_ts,
+            created_at=timezone.now(),
             is_current=True,
             **person_data
         )
-        
-        # Вызываем валидацию (включая форматирование телефона)
         person.clean()
-        person.save()
+        person.fill_search_keys()
 
-        # Персистентность: закрыть предыдущую запись в истории, если была
-        prev = (
-            Person.objects
-            .filter(group=group)
-            .exclude(id=person.id)
-            .order_by('-created_at')
-            .first()
+        # Без блокировки два параллельных запроса могут оба не найти группу и создать две
+        if settings.PERSONS_DEDUP_LOCKING:
+            PersonService.lock_blocking_keys([person_data])
+
+        # Поиск групп бэкендом; запись-«мост» сливает все совпавшие группы в минимальную
+        group_ids = PersonService.find_matching_groups(person_data)
+        if len(group_ids) > 1:
+            if not change_set:
+                change_set = PersonService.create_change_set(
+                    author='system',
+                    reason='API person creation'
+                )
+            PersonService.merge_groups(group_ids[0], group_ids[1:], change_set)
+
+        PersonService.write_person_version(
+            person,
+            group_ids[0] if group_ids else None,
+            change_set,
+            author='system',
+            reason='API person creation',
         )
-        if prev:
-            PersonHistory.objects.create(
-                group=group,
-                change=person.change or prev.change,
-                last_name=prev.last_name,
-                first_name=prev.first_name,
-                middle_name=prev.middle_name,
-                birth_date=prev.birth_date,
-                gender=prev.gender,
-                address=prev.address,
-                phone=prev.phone,
-                email=prev.email,
-                valid_from=prev.created_at,
-                valid_to=now_ts,
-            )
 
-            # НЕ помечаем прошлую запись как неактуальную - все записи остаются актуальными
-            # prev.is_current = False
-            # prev.save(update_fields=['is_current'])
+        index = get_dedup_index()
+        if index is not None:
+            transaction.on_commit(lambda: index.add_person(person))
 
         return person
 
+    @staticmethod
+    def write_person_version(person: Person, group_id: Optional[int], change_set: Optional[ChangeSet],
+                             author: str = None, reason: str = None):
+        """Запись версии человека одним запросом (CTE).
+
+        В одном выражении: набор изменений (если не передан), новая группа (если
+        group_id не задан), вставка person, перенос предыдущей версии группы в
+        person_history и строка группы в витрине. Заполняет у person id, group_id
+        и change_id.
+        """
+        person_fields = [
+            f for f in Person._meta.concrete_fields
+            if f.attname not in ('id', 'group_id', 'change_id')
+        ]
+        history_columns = [
+            f.column for f in PersonHistory._meta.concrete_fields
+            if f.attname not in ('id', 'group_id', 'change_id', 'valid_from', 'valid_to')
+        ]
+
+        params = []
+        bump_sql = ''
+        # Версия кэша поиска увеличивается тем же запросом (как в invalidate_search_cache):
+        # это последний запрос записи, блокировка слота держится только до коммита
+        cache = get_search_cache()
+        if cache is not None:
+            bump_sql = f"bump AS ({BUMP_VERSION_SQL}),"
+            params.append(VERSION_SLOTS)
+            transaction.on_commit(cache.mark_stale)
+        if change_set:
+            cs_sql = "SELECT %s::bigint AS id"
+            params.append(change_set.id)
+        else:
+            cs_sql = "INSERT INTO change_set (author, reason, authored_at) VALUES (%s, %s, %s) RETURNING id"
+            params += [author, reason, person.created_at]
+        params += [group_id, group_id, group_id]
+        params += [f.get_db_prep_save(getattr(person, f.attname), connection) for f in person_fields]
+        params.append(person.created_at)
+
+        sql = f"""
+            WITH {bump_sql}
+            cs AS (
+                {cs_sql}
+            ),
+            new_group AS (
+                INSERT INTO person_group (id)
+                SELECT nextval(pg_get_serial_sequence('person_group', 'id'))
+                WHERE %s::int IS NULL
+                RETURNING id
+            ),
+            grp AS (
+                SELECT COALESCE(%s::int, (SELECT id FROM new_group)) AS id
+            ),
+            prev AS (
+                SELECT * FROM person
+                WHERE group_id = %s::int
+                ORDER BY created_at DESC, id DESC
+                LIMIT 1
+            ),
+            ins AS (
+                INSERT INTO person (group_id, change_id, {', '.join(f.column for f in person_fields)})
+                SELECT grp.id, cs.id, {', '.join(['%s'] * len(person_fields))}
+                FROM grp, cs
+                RETURNING *
+            ),
+            vit AS (
+                {VitrineService.upsert_sql('SELECT * FROM ins')}
+            ),
+            hist AS (
+                -- Персистентность: закрыть предыдущую запись в истории, если была.
+                -- Прошлая запись в person остаётся актуальной (is_current не снимаем)
+                INSERT INTO person_history (group_id, change_id, {', '.join(history_columns)}, valid_from, valid_to)
+                SELECT prev.group_id, (SELECT id FROM cs), {', '.join('prev.' + c for c in history_columns)},
+                       prev.created_at, %s
+                FROM prev
+            )
+            SELECT id, group_id, change_id FROM ins
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            person.id, person.group_id, person.change_id = cursor.fetchone()
+
     @staticmethod
     def search_persons_vitrine(search_params: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Поиск в витрине с частичным совпадением (все записи актуальны)"""
-        qs = Person.objects.all()
+        """Поиск в витрине с частичным совпадением (одна, последняя, версия на группу)"""
+        return PersonService.search_persons_vitrine_page(search_params)[0]
 
-        # фамилия
-        if search_params.get('last_name'):
-            qs = qs.filter(last_name__icontains=search_params['last_name'])
-        
-        # фамилия и имя (если указаны оба)
-        if search_params.get('first_name'):
-            qs = qs.filter(first_name__icontains=search_params['first_name'])
-        
-        # фио
-        if search_params.get('middle_name') is not None and search_params.get('middle_name') != '':
-            qs = qs.filter(middle_name__icontains=search_params['middle_name'])
-        
-        # адрес
+    @staticmethod
+    def search_persons_vitrine_page(search_params: Dict[str, Any],
+                                    use_cache: bool = True) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Страница поиска в витрине и курсор следующей страницы.
+
+        С параметром cursor страница выбирается по ключу сортировки (keyset),
+        иначе — по offset, как раньше. Повторные запросы отдаются из кэша поиска
+        до первого нового набора изменений.
+        """
+        cache = get_search_cache() if use_cache else None
+        if cache is not None:
+            return cache.get_or_compute(
+                search_params, lambda: PersonService.search_persons_vitrine_page(search_params, use_cache=False)
+            )
+
+        qs, ordering = PersonService.vitrine_queryset(search_params)
+        # fields= сужает и SELECT, и ответ; ключ сортировки читается всегда (нужен курсору)
+        layout = RowLayout(search_params['fields']) if search_params.get('fields') else VITRINE_LAYOUT
+        rows, next_cursor = paginate(
+            qs, ordering, search_params.get('limit', 100),
+            cursor=search_params.get('cursor'), offset=search_params.get('offset', 0),
+            fields=PersonService._with_ordering(layout.fields, ordering),
+        )
+        return layout.to_dicts(rows), next_cursor
+
+    @staticmethod
+    def _with_ordering(fields: Tuple[str, ...], ordering: Tuple[str, ...]) -> Tuple[str, ...]:
+        """Поля проекции плюс недостающие поля сортировки (в конце, вне раскладки ответа)"""
+        return tuple(fields) + tuple(
+            name for name in (f.lstrip('-') for f in ordering) if name not in fields
+        )
+
+    @staticmethod
+    def vitrine_queryset(search_params: Dict[str, Any]) -> Tuple[Any, Tuple[str, ...]]:
+        """Запрос поиска по витрине (без среза) и его ключ сортировки.
+
+        Режим trigram (по умолчанию) строит фильтры col ILIKE '%x%' по столбцам
+        с GIN-индексами pg_trgm; режим contains — прежние icontains (полный просмотр).
+        phonetic=true ищет фамилию и имя по фонетическому ключу (Иваноф найдёт Иванова).
+        q — полнотекстовый поиск по адресу, по умолчанию сортирует по ts_rank.
+        ordering=similarity сортирует по сумме триграммного сходства с запросом.
+        """
+        qs = GroupVitrine.objects.all()
+        trigram = search_params.get('mode', 'trigram') == 'trigram'
+        contains = 'trgm_contains' if trigram else 'icontains'
+        similarity = []
+
+        # фамилия, имя, отчество; с phonetic=true фамилия и имя — равенство фонетических ключей
+        phonetic = search_params.get('phonetic', False)
+        for field in ('last_name', 'first_name', 'middle_name'):
+            value = search_params.get(field)
+            if value:
+                key = russian_metaphone(value) if phonetic and field != 'middle_name' else None
+                if key:
+                    qs = qs.filter(**{f'{field}_phonetic': key})
+                else:
+                    qs = qs.filter(**{f'{field}__{contains}': value})
+                similarity.append(TrigramSimilarity(field, value))
+
+        # адрес: по нормализованному ключу (регистр, ё и пунктуация не важны)
         if search_params.get('address'):
-            qs = qs.filter(address__icontains=search_params['address'])
+            if trigram:
+                address_key = normalize_address_key(search_params['address'])
+                if address_key:
+                    qs = qs.filter(address_key__contains=address_key)
+                    similarity.append(TrigramSimilarity('address_key', address_key))
+            else:
+                qs = qs.filter(address__icontains=search_params['address'])
         
-        # номер телефона (точное совпадение, так как формат стандартизирован)
+        # полнотекстовый поиск по адресу (порядок слов и сокращения не важны)
+        rank = None
+        if search_params.get('q'):
+            query = PersonService.address_search_query(search_params['q'])
+            if query is not None:
+                qs = qs.alias(address_tsv=RawSQL('"group_vitrine"."address_tsv"', [], output_field=SearchVectorField()))
+                qs = qs.filter(address_tsv=query)
+                rank = SearchRank(F('address_tsv'), query)
+
+        # номер телефона: по ключу из одних цифр, полный — точно, частичный — начало или конец номера
         if search_params.get('phone'):
-            # Нормализуем введенный телефон для поиска
-            search_phone = search_params['phone']
-            if search_phone:
-                # Убираем все символы кроме цифр
-                import re
-                digits_only = re.sub(r'[^\d]', '', search_phone.strip())
-                
-                if digits_only.startswith('8') and len(digits_only) == 11:
-                    digits_only = '7' + digits_only[1:]
-                
-                if len(digits_only) == 11 and digits_only.startswith('7'):
-                    formatted_phone = f"+7({digits_only[1:4]}){digits_only[4:7]}-{digits_only[7:9]}-{digits_only[9:11]}"
-                    qs = qs.filter(phone=formatted_phone)
-                else:
-                    # Если не удалось нормализовать, ищем как есть
-                    qs = qs.filter(phone__icontains=search_phone)
+            match, digits_only = PersonService.phone_search_key(
+                search_params['phone'], search_params.get('phone_match', 'auto')
+            )
+            if match == 'exact':
+                qs = qs.filter(phone_key=digits_only)
+            elif match == 'prefix':
+                qs = qs.filter(phone_key__startswith=digits_only)
+            elif match == 'suffix':
+                qs = qs.alias(phone_key_rev=Reverse('phone_key')).filter(phone_key_rev__startswith=digits_only[::-1])
+            else:
+                # Цифр нет — ищем как есть
+                qs = qs.filter(phone__icontains=search_params['phone'])
         
         # адрес электронной почты
         if search_params.get('email'):
-            qs = qs.filter(email__icontains=search_params['email'])
-
-        limit = search_params.get('limit', 100)
-        offset = search_params.get('offset', 0)
-
-        # Дедупликация: группируем по group_id и берем одну запись на группу
-        qs = qs.order_by('group_id')[offset:offset + limit]
-
-        return [
-            {
-                'group_id': p.group_id,
-                'last_name': p.last_name,
-                'first_name': p.first_name,
-                'middle_name': p.middle_name,
-                'birth_date': p.birth_date,
-                'gender': p.gender,
-                'address': p.address,
-                'phone': p.phone,
-                'email': p.email,
-            }
-            for p in qs
-        ]
+            email_key = normalize_email_key(search_params['email'])
+            if email_key:
+                qs = qs.filter(email_key__contains=email_key)
+                similarity.append(TrigramSimilarity('email_key', email_key))
+
+        # Оценка приводится к double precision, чтобы значение в курсоре сравнивалось точно
+        ordering = search_params.get('ordering') or ('rank' if rank is not None else 'group_id')
+        if ordering == 'similarity' and similarity:
+            score = similarity[0]
+            for expression in similarity[1:]:
+                score = score + expression
+            qs = qs.annotate(score=Cast(score, FloatField()))
+            return qs, ('-score', 'group_id')
+        if ordering == 'rank' and rank is not None:
+            qs = qs.annotate(score=Cast(rank, FloatField()))
+            return qs, ('-score', 'group_id')
+        # В витрине одна строка на группу, group_id уникален
+        return qs, ('group_id',)
+
+    @staticmethod
+    def phone_search_key(phone: str, match: str = 'auto') -> Tuple[str, Optional[str]]:
+        """Способ поиска телефона и ключ из цифр: ('exact' | 'prefix' | 'suffix' | 'contains', ключ).
+
+        В режиме auto начало номера — ввод с '+', '8' или '(' (+7916, 8916, (916)),
+        остальное ищется как конец номера (последние цифры).
+        """
+        text = phone.strip()
+        digits_only = re.sub(r'[^\d]', '', text)
+        if not digits_only:
+            return 'contains', None
+        full_key = normalize_phone_key(text)
+        if len(full_key) == 11 and full_key.startswith('7'):
+            return 'exact', full_key
+        if match == 'auto':
+            match = 'prefix' if text[0] in '+8(' else 'suffix'
+        if match == 'prefix' and not text.startswith('+'):
+            # Номер без кода страны: 8916... -> 7916..., (916)... -> 7916...
+            digits_only = '7' + (digits_only[1:] if digits_only[0] in '78' else digits_only)
+        return match, digits_only
+
+    @staticmethod
+    def address_search_query(text: str) -> Optional[SearchQuery]:
+        """Запрос к address_tsv: все слова обязательны, слова — префиксы, номера — точно.
+
+        Префиксы покрывают сокращения («ул» находит «улица»), словоформы
+        приводит к основе русская конфигурация to_tsquery.
+        """
+        key = normalize_address_key(text)
+        if not key:
+            return None
+        terms = [word if word.isdigit() else f'{word}:*' for word in key.split()]
+        return SearchQuery(' & '.join(terms), config=ADDRESS_SEARCH_CONFIG, search_type='raw')
 
     @staticmethod
     def get_person_as_of(group_id: int, timestamp: timezone.datetime) -> Optional[Dict[str, Any]]:
         """Получение состояния человека на момент времени."""
+        # Старые id слитых групп указывают на актуальную группу
+        group_id = resolve_group_id(group_id)
         # Ищем самую свежую запись для группы на указанный момент времени
         current = (
             Person.objects
             .filter(group_id=group_id, created_at__lte=timestamp)
-            .order_by('-created_at')
+            .order_by('-created_at', '-id')
+            .values_list(*VITRINE_LAYOUT.fields)
             .first()
         )
         if current:
-            return {
-                'group_id': current.group_id,
-                'last_name': current.last_name,
-                'first_name': current.first_name,
-                'middle_name': current.middle_name,
-                'birth_date': current.birth_date,
-                'gender': current.gender,
-                'address': current.address,
-                'phone': current.phone,
-                'email': current.email,
-            }
+            return VITRINE_LAYOUT.to_dict(current)
 
         # 2) иначе ищем историческую запись, перекрывающую момент времени
         hist = (
-            PersonHistory.objects
-            .filter(group_id=group_id, valid_from__lte=timestamp, valid_to__gt=timestamp)
-            .order_by('-valid_from')
+            PersonHistory.valid_at(group_id, timestamp)
+            .values_list(*VITRINE_LAYOUT.fields)
             .first()
         )
         if hist:
-            return {
-                'group_id': hist.group_id,
-                'last_name': hist.last_name,
-                'first_name': hist.first_name,
-                'middle_name': hist.middle_name,
-                'birth_date': hist.birth_date,
-                'gender': hist.gender,
-                'address': hist.address,
-                'phone': hist.phone,
-                'email': hist.email,
-            }
+            return VITRINE_LAYOUT.to_dict(hist)
         return None
 
     @staticmethod
@@ -232,10 +612,33 @@ class PersonService:
         """Получить всех людей (все записи актуальны для своего времени)"""
         return Person.objects.all().select_related('group', 'change').order_by('-created_at')
 
+    @staticmethod
+    def get_current_persons_page(limit: int = 100, cursor: str = None,
+                                 fields: Tuple[str, ...] = None) -> Tuple[List[Person], Optional[str]]:
+        """Страница списка людей (новые сначала) и курсор следующей страницы.
+
+        fields ограничивает загружаемые столбцы (only()).
+        """
+        ordering = ('-created_at', '-id')
+        qs = Person.objects.all()
+        if fields:
+            qs = qs.only(*PersonService._with_ordering(fields, ordering))
+        return paginate(qs, ordering, limit, cursor)
+
+    @staticmethod
+    def get_current_persons_rows(limit: int = 100, cursor: str = None,
+                                 fields: Tuple[str, ...] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """То же, что get_current_persons_page, но словарями в формате PersonSerializer без моделей"""
+        ordering = ('-created_at', '-id')
+        layout = RowLayout(fields) if fields else PERSON_LAYOUT
+        rows, next_cursor = paginate(Person.objects.all(), ordering, limit, cursor,
+                                     fields=PersonService._with_ordering(layout.fields, ordering))
+        return layout.to_dicts(rows), next_cursor
+
     @staticmethod
     def get_person_history(group_id: int) -> List[PersonHistory]:
         """Получение истории изменений для группы"""
-        return PersonHistory.objects.filter(group_id=group_id).order_by('valid_from')
+        return PersonHistory.objects.filter(group_id=resolve_group_id(group_id)).order_by('valid_from')
 
 
 class DatabaseInitService:
@@ -245,11 +648,13 @@ class DatabaseInitService:
     def execute_sql_script(sql_content: str):
         """Выполнение SQL скрипта"""
         with connection.cursor() as cursor:
-            # Разбиваем скрипт на отдельные команды
+            # Убираем комментарии (кроме строковых литералов) и разбиваем скрипт на отдельные команды:
+            # команда, перед которой стоит комментарий, не должна пропускаться
+            sql_content = _SQL_COMMENT_RE.sub(lambda m: m.group(1) or '', sql_content)
             statements = sql_content.split(';')
             for statement in statements:
                 statement = statement.strip()
-                if statement and not statement.startswith('--'):
+                if statement:
                     try:
                         cursor.execute(statement)
                     except Exception as e:
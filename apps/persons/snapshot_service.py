@@ -0,0 +1,236 @@
+import csv
+import zlib
+from datetime import date, datetime
+from django.db import connection
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .checkpoint_service import CheckpointService, VERSION_FIELDS
+from .export_service import _Echo
+from .fast_json import dumps
+from .group_aliases import resolve_group_id
+
+# Поля версии на момент времени — те же, что отдаёт /api/persons/{group_id}/as-of/
+AS_OF_FIELDS = ('group_id',) + VERSION_FIELDS
+
+
+class SnapshotService:
+    """Состояние многих групп (или всего реестра) на один момент времени одним запросом"""
+
+    DEFAULT_CHUNK_SIZE = 5000
+    MAX_GROUP_IDS = 100000
+
+    @staticmethod
+    def as_of_query(timestamp: datetime, group_ids: Optional[List[int]] = None,
+                    groups_sql: str = None) -> Tuple[str, list]:
+        """DISTINCT ON (group_id) по объединению версий person и person_history.
+
+        Как в get_person_as_of: последняя версия в person с created_at <= ts,
+        иначе версия из истории, действовавшая в ts (validity @> ts). Версии person
+        читаются от ближайшей контрольной точки (CheckpointService). Группы — как
+        в CheckpointService.person_versions_sql.
+        """
+        columns = ', '.join(AS_OF_FIELDS)
+        versions_sql, params = CheckpointService.person_versions_sql(timestamp, group_ids, groups_sql)
+        group_params = []
+        if groups_sql is None and group_ids is not None:
+            groups_sql, group_params = '%s::int[]', [group_ids]
+        group_filter = f'AND group_id = ANY({groups_sql})' if groups_sql is not None else ''
+        sql = f"""
+            SELECT DISTINCT ON (v.group_id) {', '.join('v.' + c for c in AS_OF_FIELDS)}
+            FROM (
+                SELECT pv.*, 0 AS src FROM ({versions_sql}) pv
+                UNION ALL
+                SELECT {columns}, valid_from AS version_at, id, 1 AS src
+                FROM person_history
+                WHERE validity @> %s::timestamptz {group_filter}
+            ) v
+            ORDER BY v.group_id, v.src, v.version_at DESC, v.id DESC
+        """
+        params += [timestamp] + group_params
+        return sql, params
+
+    @staticmethod
+    def iter_as_of(timestamp: datetime, group_ids: Optional[List[int]] = None,
+                   chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+        """Версии групп на момент timestamp в порядке group_id; group_ids=None — все группы.
+
+        Старые id слитых групп разрешаются в актуальные; у строк, запрошенных
+        по списку, requested_group_id — id из запроса. Группы без версии на этот
+        момент пропускаются. Строки читаются серверным курсором пачками.
+        """
+        requested = None
+        if group_ids is not None:
+            requested = {}
+            for group_id in group_ids:
+                requested.setdefault(resolve_group_id(group_id), []).append(group_id)
+        sql, params = SnapshotService.as_of_query(timestamp, sorted(requested) if requested is not None else None)
+
+        with connection.chunked_cursor() as cursor:
+            cursor.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                for row in rows:
+                    data = dict(zip(AS_OF_FIELDS, row))
+                    if requested is None:
+                        yield data
+                        continue
+                    for group_id in requested[data['group_id']]:
+                        yield {'requested_group_id': group_id, **data}
+
+    @staticmethod
+    def iter_as_of_export(timestamp: datetime, fmt: str = 'jsonl', group_ids: Optional[List[int]] = None,
+                          chunk_size: int = DEFAULT_CHUNK_SIZE,
+                          on_chunk: Callable[[int], None] = None) -> Iterator[bytes]:
+        """NDJSON или CSV (с заголовком) версий на момент времени, пачками по chunk_size строк.
+
+        on_chunk(rows) вызывается после каждой пачки с числом строк, выданных к этому моменту.
+        """
+        fields = AS_OF_FIELDS if group_ids is None else ('requested_group_id',) + AS_OF_FIELDS
+        if fmt == 'csv':
+            writer = csv.writer(_Echo())
+
+            def encode(data):
+                return writer.writerow([
+                    value.isoformat() if isinstance(value, (datetime, date)) else value
+                    for value in (data[field] for field in fields)
+                ]).encode('utf-8')
+
+            yield writer.writerow(fields).encode('utf-8')
+        elif fmt == 'jsonl':
+            def encode(data):
+                return dumps(data) + b'\n'
+        else:
+            raise ValueError(f'Unknown export format: {fmt}')
+
+        rows = 0
+        buffer = []
+        for data in SnapshotService.iter_as_of(timestamp, group_ids, chunk_size):
+            buffer.append(encode(data))
+            if len(buffer) >= chunk_size:
+                rows += len(buffer)
+                yield b''.join(buffer)
+                buffer = []
+                if on_chunk:
+                    on_chunk(rows)
+        if buffer:
+            rows += len(buffer)
+            yield b''.join(buffer)
+        if on_chunk:
+            on_chunk(rows)
+
+    @staticmethod
+    def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+        """Потоковое gzip-сжатие: память не зависит от объёма данных"""
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+
+    @staticmethod
+    def changed_groups_sql(timestamp1: datetime, timestamp2: datetime) -> Tuple[str, list]:
+        """Группы, у которых между моментами могла смениться версия: SELECT group_id.
+
+        Версия в person появилась в (t1, t2] или граница действия версии из истории
+        попала в этот интервал; состояние остальных групп в t1 и t2 совпадает.
+        """
+        low, high = sorted((timestamp1, timestamp2))
+        sql = """
+            SELECT group_id FROM person
+            WHERE created_at > %s AND created_at <= %s
+            UNION
+            SELECT group_id FROM person_history
+            WHERE validity && tstzrange(%s, %s, '(]')
+              AND NOT validity @> tstzrange(%s, %s, '(]')
+        """
+        return sql, [low, high, low, high, low, high]
+
+    @staticmethod
+    def diff_query(timestamp1: datetime, timestamp2: datetime, group_ids: Optional[List[int]] = None,
+                   changed_only: bool = True, candidates_only: bool = False) -> Tuple[str, list]:
+        """Состояния групп в t1 и t2 одним запросом: FULL JOIN двух as-of выборок по group_id.
+
+        Строка: group_id, есть ли версия в t1, её поля, есть ли версия в t2, её поля.
+        changed_only оставляет только группы, у которых поля различаются.
+        candidates_only считает оба состояния только для групп из changed_groups_sql —
+        множество собирается в CTE того же запроса, а не передаётся списком.
+        """
+        ctes, params = [], []
+        groups_sql = None
+        if candidates_only:
+            changed_sql, params = SnapshotService.changed_groups_sql(timestamp1, timestamp2)
+            ctes.append(f'changed AS ({changed_sql})')
+            groups_sql = 'ARRAY(SELECT group_id FROM changed)'
+        sql1, params1 = SnapshotService.as_of_query(timestamp1, group_ids, groups_sql)
+        sql2, params2 = SnapshotService.as_of_query(timestamp2, group_ids, groups_sql)
+        ctes += [f's1 AS ({sql1})', f's2 AS ({sql2})']
+        where = ''
+        if changed_only:
+            where = (f"WHERE ({', '.join('s1.' + c for c in VERSION_FIELDS)}) "
+                     f"IS DISTINCT FROM ({', '.join('s2.' + c for c in VERSION_FIELDS)})")
+        sql = f"""
+            WITH {', '.join(ctes)}
+            SELECT COALESCE(s1.group_id, s2.group_id) AS group_id,
+                   s1.group_id IS NOT NULL, {', '.join('s1.' + c for c in VERSION_FIELDS)},
+                   s2.group_id IS NOT NULL, {', '.join('s2.' + c for c in VERSION_FIELDS)}
+            FROM s1 FULL JOIN s2 ON s1.group_id = s2.group_id
+            {where}
+            ORDER BY 1
+        """
+        return sql, params + params1 + params2
+
+    @staticmethod
+    def diff_row(row: tuple) -> Dict[str, Any]:
+        """Строка diff_query -> {group_id, status, before, after, changes: {поле: [было, стало]}}"""
+        width = len(VERSION_FIELDS)
+        before = dict(zip(VERSION_FIELDS, row[2:2 + width])) if row[1] else None
+        after = dict(zip(VERSION_FIELDS, row[3 + width:])) if row[2 + width] else None
+        if before is None:
+            status = 'added'
+        elif after is None:
+            status = 'removed'
+        else:
+            status = 'unchanged'
+        changes = {}
+        if before is not None and after is not None:
+            changes = {
+                field: [before[field], after[field]]
+                for field in VERSION_FIELDS if before[field] != after[field]
+            }
+            if changes:
+                status = 'changed'
+        return {'group_id': row[0], 'status': status, 'before': before, 'after': after, 'changes': changes}
+
+    @staticmethod
+    def iter_diff(timestamp1: datetime, timestamp2: datetime,
+                  chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+        """Изменившиеся группы между t1 и t2 по всему реестру, в порядке group_id.
+
+        Оба состояния считаются только для групп из changed_groups_sql (в том же
+        запросе), строки читаются серверным курсором и разбираются за один проход.
+        """
+        sql, params = SnapshotService.diff_query(timestamp1, timestamp2, candidates_only=True)
+        with connection.chunked_cursor() as cursor:
+            cursor.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield SnapshotService.diff_row(row)
+
+    @staticmethod
+    def iter_diff_jsonl(timestamp1: datetime, timestamp2: datetime,
+                        chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+        """NDJSON изменений между t1 и t2, пачками по chunk_size строк"""
+        buffer = []
+        for item in SnapshotService.iter_diff(timestamp1, timestamp2, chunk_size):
+            buffer.append(dumps(item) + b'\n')
+            if len(buffer) >= chunk_size:
+                yield b''.join(buffer)
+                buffer = []
+        if buffer:
+            yield b''.join(buffer)
@@ -0,0 +1,72 @@
+from contextlib import contextmanager
+from unittest import mock
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from .group_aliases import GroupAliasResolver
+from .services import DatabaseInitService, PersonService
+
+
+PERSON = {
+    'last_name': 'Иванова',
+    'first_name': 'Анна',
+    'middle_name': 'Петровна',
+    'birth_date': '1990-01-01',
+    'gender': 'Ж',
+    'address': 'ул. Ленина, 1',
+    'phone': '+79000000000',
+    'email': 'anna@mail.ru',
+}
+
+
+@override_settings(PERSONS_DEDUP_INDEX=False, PERSONS_DEDUP_LOCKING=False, ALLOWED_HOSTS=['testserver'])
+class QueryCountTests(TestCase):
+    """Число запросов на запись и чтение списка (модели не управляются Django — схема из sqlScript.sql)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        with open(settings.BASE_DIR / 'sqlScript.sql', encoding='utf-8') as file:
+            DatabaseInitService.execute_sql_script(file.read())
+
+    def setUp(self):
+        # Разрешение слитых групп загружается один раз на процесс и догружается по таймеру —
+        # в тесте свой экземпляр, загруженный заранее и без догрузки во время замера
+        resolver = GroupAliasResolver(refresh_interval=3600)
+        resolver.refresh()
+        patcher = mock.patch('apps.persons.group_aliases._resolver', resolver)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @contextmanager
+    def assertNumStatements(self, num):
+        """Как assertNumQueries, но без SAVEPOINT вложенного atomic (в транзакции теста)"""
+        with CaptureQueriesContext(connection) as context:
+            yield
+        statements = [q['sql'] for q in context.captured_queries if 'SAVEPOINT' not in q['sql']]
+        self.assertEqual(len(statements), num, '\n'.join(statements))
+
+    def test_create_person_new_group(self):
+        # Поиск группы и запись версии одним CTE
+        with self.assertNumStatements(2):
+            person = PersonService.create_person(dict(PERSON))
+        self.assertIsNotNone(person.id)
+        self.assertIsNotNone(person.group_id)
+
+    def test_create_person_existing_group(self):
+        first = PersonService.create_person(dict(PERSON))
+        with self.assertNumStatements(2):
+            second = PersonService.create_person(dict(PERSON, address='ул. Мира, 5'))
+        self.assertEqual(second.group_id, first.group_id)
+
+    def test_list_persons(self):
+        for i, first_name in enumerate(('Анна', 'Мария', 'Елена')):
+            PersonService.create_person(dict(PERSON, first_name=first_name, phone=f'+7900000000{i}',
+                                             email=f'user{i}@mail.ru', address=f'ул. Ленина, {i + 1}'))
+        # Страница списка — один запрос, сколько бы строк в ней ни было
+        with self.assertNumStatements(1):
+            response = self.client.get('/api/persons/list/', {'limit': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 2)
+        self.assertIsNotNone(response.json()['next_cursor'])
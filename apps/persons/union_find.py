@@ -0,0 +1,54 @@
+from typing import Dict, Hashable, Iterable, List
+
+
+class UnionFind:
+    """Система непересекающихся множеств (union-find) со сжатием путей.
+
+    Корнем множества всегда остаётся минимальный элемент, поэтому find() сразу
+    даёт канонический id группы (самый старый из слитых).
+    """
+
+    def __init__(self, items: Iterable[Hashable] = ()):
+        self.parent: Dict[Hashable, Hashable] = {}
+        for item in items:
+            self.parent[item] = item
+
+    def __contains__(self, item) -> bool:
+        return item in self.parent
+
+    def add(self, item: Hashable):
+        self.parent.setdefault(item, item)
+
+    def find(self, item: Hashable) -> Hashable:
+        parent = self.parent.setdefault(item, item)
+        if parent == item:
+            return item
+        root = parent
+        while self.parent[root] != root:
+            root = self.parent[root]
+        # Сжатие пути: все узлы цепочки указывают прямо на корень
+        while item != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, a: Hashable, b: Hashable) -> Hashable:
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return root_a
+        if root_b < root_a:
+            root_a, root_b = root_b, root_a
+        self.parent[root_b] = root_a
+        return root_a
+
+    def union_all(self, items: List[Hashable]) -> Hashable:
+        root = self.find(items[0])
+        for item in items[1:]:
+            root = self.union(root, item)
+        return root
+
+    def groups(self) -> Dict[Hashable, List[Hashable]]:
+        """Корень -> все элементы множества"""
+        result: Dict[Hashable, List[Hashable]] = {}
+        for item in list(self.parent):
+            result.setdefault(self.find(item), []).append(item)
+        return result
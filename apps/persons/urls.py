@@ -11,9 +11,17 @@ urlpatterns = [
     # API endpoints для работы с людьми
     path('api/persons/', views.api_create_person, name='api_create_person'),
     path('api/persons/create/', views.api_create_person, name='api_create_person_legacy'),
+    path('api/persons/bulk/', views.api_bulk_import_persons, name='api_bulk_import_persons'),
+    path('api/persons/tickets/<int:ticket_id>/', views.api_ingest_ticket, name='api_ingest_ticket'),
     path('api/persons/list/', views.api_list_persons, name='api_list_persons'),
+    path('api/persons/export.ndjson', views.api_export_persons, {'fmt': 'jsonl'}, name='api_export_persons_ndjson'),
+    path('api/persons/export.csv', views.api_export_persons, {'fmt': 'csv'}, name='api_export_persons_csv'),
     path('api/persons/search/', views.api_search_persons, name='api_search_persons'),
+    path('api/persons/search/cache-stats/', views.api_search_cache_stats, name='api_search_cache_stats'),
     path('api/persons/<int:group_id>/as-of/', views.api_person_as_of, name='api_person_as_of'),
+    path('api/persons/as-of/batch', views.api_person_as_of_batch, name='api_person_as_of_batch'),
+    path('api/persons/snapshot.ndjson', views.api_snapshot, {'fmt': 'jsonl'}, name='api_snapshot_ndjson'),
+    path('api/persons/snapshot.csv', views.api_snapshot, {'fmt': 'csv'}, name='api_snapshot_csv'),
     
     # API endpoints для истории групп (простые по ID)
     path('api/groups/<int:group_id>/history/', views.api_group_history_simple, name='api_group_history_simple'),
@@ -38,6 +46,7 @@ urlpatterns = [
     path('api/persistency/groups/<str:group_name>/members/', persistency_views.GroupManagementView.as_view(), name='api_group_members'),
     path('api/persistency/groups/<str:group_name>/members/<int:person_id>/', persistency_views.GroupManagementView.as_view(), name='api_group_member_delete'),
     
+    path('api/persistency/changes.ndjson', persistency_views.DatasetChangesView.as_view(), name='api_dataset_changes'),
     path('api/persistency/changesets/', persistency_views.ChangesetListView.as_view(), name='api_changesets_list'),
     path('api/persistency/changesets/<uuid:changeset_id>/', persistency_views.ChangesetDetailView.as_view(), name='api_changeset_detail'),
     path('api/persistency/persons/<int:person_id>/history/', persistency_views.PersonHistoryView.as_view(), name='api_person_history'),
@@ -1,5 +1,7 @@
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.conf import settings
+from django.urls import reverse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views import View
 from rest_framework import status
 from rest_framework.decorators import api_view
@@ -8,11 +10,32 @@ from rest_framework import status
 from .dadata_service import DaDataService 
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
+from django.db.models import Exists, OuterRef, Value
+from django.db.models.functions import Coalesce
 import json
 
 from .models import Person, PersonHistory, ChangeSet
-from .serializers import PersonSerializer, PersonSearchSerializer, PersonVitrineSerializer
+from .serializers import PersonSerializer, PersonSearchSerializer, PersonVitrineSerializer, PersonListQuerySerializer
 from .services import PersonService
+from .bulk_service import BulkImportService
+from .export_service import ExportService
+from .snapshot_service import SnapshotService
+from .ingest_queue import IngestQueueService
+from .group_aliases import resolve_group_id
+from .idempotency import get_idempotency_store, MAX_KEY_LENGTH
+from .pagination import CursorError, paginate
+from .search_cache import get_search_cache
+from .fast_json import FastJsonResponse, fast_json_enabled
+
+
+def _idempotency_key(request, scope):
+    """Ключ идемпотентности запроса в пространстве scope (None, если заголовка нет)"""
+    key = request.headers.get('Idempotency-Key')
+    if not key:
+        return None
+    if len(key) > MAX_KEY_LENGTH:
+        raise ValueError(f'Idempotency-Key must be at most {MAX_KEY_LENGTH} characters')
+    return f'{scope}:{key}'
 
 
 @method_decorator(csrf_exempt, name='dispatch')
@@ -24,59 +47,193 @@ class PersonCreateView(View):
         return render(request, 'persons/create_person.html')
     
     def post(self, request):
-        """Обработка создания человека"""
+        """Обработка создания человека (поддерживает заголовок Idempotency-Key)"""
         try:
-            if request.content_type == 'application/json':
-                data = json.loads(request.body)
-            else:
-                data = request.POST.dict()
-            
-            serializer = PersonSerializer(data=data)
-            if serializer.is_valid():
-                person = PersonService.create_person(serializer.validated_data)
-                return JsonResponse({
-                    'success': True,
-                    'message': 'Человек успешно добавлен',
-                    'person_id': person.id,
-                    'group_id': person.group.id
-                })
-            else:
-                return JsonResponse({
-                    'success': False,
-                    'errors': serializer.errors
-                }, status=400)
-                
+            idempotency_key = _idempotency_key(request, 'web')
+        except ValueError as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+        try:
+            if idempotency_key:
+                status_code, body, replayed = get_idempotency_store().run(
+                    idempotency_key, lambda: self._create(request)
+                )
+                response = JsonResponse(body, status=status_code)
+                if replayed:
+                    response['Idempotent-Replayed'] = 'true'
+                return response
+
+            status_code, body = self._create(request)
+            return JsonResponse(body, status=status_code)
+
         except Exception as e:
             return JsonResponse({
                 'success': False,
                 'error': str(e)
             }, status=500)
 
+    def _create(self, request):
+        if request.content_type == 'application/json':
+            data = json.loads(request.body)
+        else:
+            data = request.POST.dict()
 
-@api_view(['POST'])
-def api_create_person(request):
-    """API endpoint для создания человека"""
-    serializer = PersonSerializer(data=request.data)
-    if serializer.is_valid():
-        try:
+        serializer = PersonSerializer(data=data)
+        if serializer.is_valid():
             person = PersonService.create_person(serializer.validated_data)
-            return Response({
+            return 200, {
                 'success': True,
                 'message': 'Человек успешно добавлен',
                 'person_id': person.id,
-                'group_id': person.group.id if person.group else None,
-                'data': PersonSerializer(person).data
-            }, status=status.HTTP_201_CREATED)
-        except Exception as e:
+                'group_id': person.group_id
+            }
+        else:
+            return 400, {
+                'success': False,
+                'errors': serializer.errors
+            }
+
+
+def _create_person_api(request):
+    """Создание человека для api_create_person: возвращает (код, тело ответа)"""
+    serializer = PersonSerializer(data=request.data)
+    if not serializer.is_valid():
+        return status.HTTP_400_BAD_REQUEST, {
+            'success': False,
+            'errors': serializer.errors
+        }
+
+    if settings.PERSONS_ASYNC_INGEST or 'respond-async' in request.headers.get('Prefer', ''):
+        ticket = IngestQueueService.enqueue(serializer.validated_data)
+        return status.HTTP_202_ACCEPTED, {
+            'success': True,
+            'message': 'Запрос принят в обработку',
+            'ticket_id': ticket.id,
+            'status': ticket.status,
+            'status_url': reverse('api_ingest_ticket', args=[ticket.id])
+        }
+
+    person = PersonService.create_person(serializer.validated_data)
+    return status.HTTP_201_CREATED, {
+        'success': True,
+        'message': 'Человек успешно добавлен',
+        'person_id': person.id,
+        'group_id': person.group_id,
+        'data': PersonSerializer(person).data
+    }
+
+
+@api_view(['POST'])
+def api_create_person(request):
+    """API endpoint для создания человека (поддерживает заголовок Idempotency-Key)"""
+    try:
+        idempotency_key = _idempotency_key(request, 'api')
+    except ValueError as e:
+        return Response({'success': False, 'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        if idempotency_key:
+            status_code, body, replayed = get_idempotency_store().run(
+                idempotency_key, lambda: _create_person_api(request)
+            )
+            headers = {'Idempotent-Replayed': 'true'} if replayed else None
+            return Response(body, status=status_code, headers=headers)
+
+        status_code, body = _create_person_api(request)
+        return Response(body, status=status_code)
+    except Exception as e:
+        return Response({
+            'success': False,
+            'error': str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['GET'])
+def api_ingest_ticket(request, ticket_id):
+    """API endpoint для получения статуса асинхронного создания человека"""
+    try:
+        ticket = IngestQueueService.get_ticket(ticket_id)
+        if ticket is None:
             return Response({
                 'success': False,
-                'error': str(e)
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-    
-    return Response({
-        'success': False,
-        'errors': serializer.errors
-    }, status=status.HTTP_400_BAD_REQUEST)
+                'error': f'Ticket {ticket_id} not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+        return Response({'success': True, **ticket})
+    except Exception as e:
+        return Response({
+            'success': False,
+            'error': str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+EXPORT_CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+
+def api_export_persons(request, fmt):
+    """Потоковая выгрузка людей (source=persons) или витрины (source=vitrine) в CSV/NDJSON"""
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Only GET method allowed'}, status=405)
+
+    source = request.GET.get('source', 'persons')
+    try:
+        chunk_size = int(request.GET.get('chunk_size', ExportService.DEFAULT_CHUNK_SIZE))
+        if chunk_size < 1:
+            raise ValueError('chunk_size must be positive')
+        stream = ExportService.iter_export(source, fmt, chunk_size)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    response = StreamingHttpResponse(stream, content_type=EXPORT_CONTENT_TYPES[fmt])
+    extension = 'csv' if fmt == 'csv' else 'ndjson'
+    response['Content-Disposition'] = f'attachment; filename="{source}.{extension}"'
+    return response
+
+
+@csrf_exempt
+def api_bulk_import_persons(request):
+    """API endpoint для массовой загрузки людей (CSV или JSONL в теле запроса)"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Only POST method allowed'}, status=405)
+
+    try:
+        batch_size = int(request.GET.get('batch_size', BulkImportService.DEFAULT_BATCH_SIZE))
+        if batch_size < 1:
+            raise ValueError('batch_size must be positive')
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': f'Invalid batch_size: {e}'}, status=400)
+
+    content_type = request.content_type
+    lines = (line.decode('utf-8') for line in request)
+    if content_type == 'text/csv':
+        rows = BulkImportService.iter_csv_rows(lines)
+    elif content_type in ('application/x-ndjson', 'application/jsonl', 'application/x-jsonlines'):
+        rows = BulkImportService.iter_jsonl_rows(lines)
+    elif content_type == 'application/json':
+        try:
+            data = json.loads(request.body)
+        except ValueError as e:
+            return JsonResponse({'success': False, 'error': f'Invalid JSON: {e}'}, status=400)
+        if not isinstance(data, list):
+            return JsonResponse({'success': False, 'error': 'JSON body must be a list of persons'}, status=400)
+        rows = enumerate(data, start=1)
+    else:
+        return JsonResponse({
+            'success': False,
+            'error': 'Supported content types: text/csv, application/x-ndjson, application/json'
+        }, status=415)
+
+    try:
+        report = BulkImportService.import_rows(
+            rows,
+            batch_size=batch_size,
+            author=request.GET.get('author') or 'system',
+        )
+        return JsonResponse({'success': report['failed'] == 0, **report})
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
 
 @api_view(['GET'])
@@ -86,14 +243,29 @@ def api_search_persons(request):
     
     if search_serializer.is_valid():
         try:
-            results = PersonService.search_persons_vitrine(search_serializer.validated_data)
-            vitrine_serializer = PersonVitrineSerializer(results, many=True)
+            results, next_cursor = PersonService.search_persons_vitrine_page(search_serializer.validated_data)
+            if fast_json_enabled(request, 'search'):
+                return FastJsonResponse({
+                    'success': True,
+                    'count': len(results),
+                    'data': results,
+                    'next_cursor': next_cursor
+                })
+            vitrine_serializer = PersonVitrineSerializer(
+                results, many=True, fields=search_serializer.validated_data.get('fields')
+            )
             
             return Response({
                 'success': True,
                 'count': len(results),
-                'data': vitrine_serializer.data
+                'data': vitrine_serializer.data,
+                'next_cursor': next_cursor
             })
+        except CursorError as e:
+            return Response({
+                'success': False,
+                'error': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response({
                 'success': False,
@@ -106,18 +278,60 @@ def api_search_persons(request):
     }, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['GET'])
+def api_search_cache_stats(request):
+    """Счётчики кэша поиска в этом воркере"""
+    cache = get_search_cache()
+    return Response({
+        'success': True,
+        'enabled': cache is not None,
+        'data': cache.stats() if cache is not None else None
+    })
+
+
 @api_view(['GET'])
 def api_list_persons(request):
     """API endpoint для получения списка всех текущих людей"""
+    page_serializer = PersonListQuerySerializer(data=request.query_params)
+    if not page_serializer.is_valid():
+        return Response({
+            'success': False,
+            'errors': page_serializer.errors
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    fields = page_serializer.validated_data.get('fields')
     try:
-        persons = PersonService.get_all_current_persons()
-        serializer = PersonSerializer(persons, many=True)
+        if fast_json_enabled(request, 'list'):
+            rows, next_cursor = PersonService.get_current_persons_rows(
+                limit=page_serializer.validated_data['limit'],
+                cursor=page_serializer.validated_data.get('cursor'),
+                fields=fields,
+            )
+            return FastJsonResponse({
+                'success': True,
+                'count': len(rows),
+                'data': rows,
+                'next_cursor': next_cursor
+            })
+
+        persons, next_cursor = PersonService.get_current_persons_page(
+            limit=page_serializer.validated_data['limit'],
+            cursor=page_serializer.validated_data.get('cursor'),
+            fields=fields,
+        )
+        serializer = PersonSerializer(persons, many=True, fields=fields)
         
         return Response({
             'success': True,
             'count': len(persons),
-            'data': serializer.data
+            'data': serializer.data,
+            'next_cursor': next_cursor
         })
+    except CursorError as e:
+        return Response({
+            'success': False,
+            'error': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response({
             'success': False,
@@ -125,6 +339,77 @@ def api_list_persons(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def api_snapshot(request, fmt):
+    """Весь реестр (одна строка на группу) на момент as_of, потоком NDJSON/CSV, по умолчанию в gzip"""
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Only GET method allowed'}, status=405)
+
+    timestamp_str = request.GET.get('as_of')
+    if not timestamp_str:
+        return JsonResponse({'success': False, 'error': 'as_of parameter is required'}, status=400)
+    compress = request.GET.get('compress', 'gzip')
+    if compress not in ('gzip', 'none'):
+        return JsonResponse({'success': False, 'error': 'compress must be gzip or none'}, status=400)
+    try:
+        from datetime import datetime
+        timestamp = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
+        chunk_size = int(request.GET.get('chunk_size', SnapshotService.DEFAULT_CHUNK_SIZE))
+        if chunk_size < 1:
+            raise ValueError('chunk_size must be positive')
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    stream = SnapshotService.iter_as_of_export(timestamp, fmt, chunk_size=chunk_size)
+    filename = f"snapshot-{timestamp.strftime('%Y%m%dT%H%M%S')}.{'csv' if fmt == 'csv' else 'ndjson'}"
+    if compress == 'gzip':
+        response = StreamingHttpResponse(SnapshotService.gzip_chunks(stream), content_type='application/gzip')
+        filename += '.gz'
+    else:
+        response = StreamingHttpResponse(stream, content_type=EXPORT_CONTENT_TYPES[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@csrf_exempt
+def api_person_as_of_batch(request):
+    """Состояние многих групп на один момент времени (NDJSON-поток).
+
+    Тело: {"timestamp": "2024-01-01T00:00:00Z", "group_ids": [1, 2, 3] | "all"}.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Only POST method allowed'}, status=405)
+
+    try:
+        data = json.loads(request.body)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': f'Invalid JSON: {e}'}, status=400)
+    if not isinstance(data, dict):
+        return JsonResponse({'success': False, 'error': 'JSON body must be an object'}, status=400)
+
+    timestamp_str = data.get('timestamp')
+    if not isinstance(timestamp_str, str) or not timestamp_str:
+        return JsonResponse({'success': False, 'error': 'timestamp is required'}, status=400)
+    try:
+        from datetime import datetime
+        timestamp = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': f'Invalid timestamp format: {e}'}, status=400)
+
+    group_ids = data.get('group_ids')
+    if group_ids == 'all':
+        group_ids = None
+    elif (not isinstance(group_ids, list) or not group_ids
+          or not all(isinstance(group_id, int) and not isinstance(group_id, bool) for group_id in group_ids)):
+        return JsonResponse({'success': False, 'error': 'group_ids must be a non-empty list of integers or "all"'},
+                            status=400)
+    elif len(group_ids) > SnapshotService.MAX_GROUP_IDS:
+        return JsonResponse({'success': False, 'error': f'At most {SnapshotService.MAX_GROUP_IDS} group_ids'},
+                            status=400)
+
+    stream = SnapshotService.iter_as_of_export(timestamp, 'jsonl', group_ids)
+    return StreamingHttpResponse(stream, content_type=EXPORT_CONTENT_TYPES['jsonl'])
+
+
 @api_view(['GET'])
 def api_person_as_of(request, group_id):
     """API endpoint для получения состояния человека на определенный момент времени"""
@@ -142,6 +427,11 @@ def api_person_as_of(request, group_id):
         
         result = PersonService.get_person_as_of(group_id, timestamp)
         
+        if result and fast_json_enabled(request, 'as_of'):
+            return FastJsonResponse({
+                'success': True,
+                'data': result
+            })
         if result:
             return Response({
                 'success': True,
@@ -218,24 +508,38 @@ def api_group_history_simple(request, group_id):
         return JsonResponse({'error': 'Only GET method allowed'}, status=405)
     
     try:
-        # Получаем историю изменений для группы
-        history = PersonHistory.objects.filter(
-            group_id=group_id
-        ).select_related('change').order_by('-valid_from')
+        limit = int(request.GET.get('limit', 100))
+        if not 1 <= limit <= 1000:
+            return JsonResponse({'error': 'limit must be between 1 and 1000'}, status=400)
+        cursor = request.GET.get('cursor')
+
+        # Старые id слитых групп указывают на актуальную группу
+        group_id = resolve_group_id(group_id)
+
+        # Исторические записи только для людей, которых нет в текущем составе (по ФИО) —
+        # отбор в запросе, текущий состав для этого не загружается
+        current_members = Person.objects.filter(group_id=group_id)
+        same_name = current_members.alias(middle=Coalesce('middle_name', Value(''))).filter(
+            last_name=OuterRef('last_name'),
+            first_name=OuterRef('first_name'),
+            middle=Coalesce(OuterRef('middle_name'), Value('')),
+        )
+
+        # Получаем страницу истории изменений для группы (новые сначала)
+        history, next_cursor = paginate(
+            PersonHistory.objects.filter(group_id=group_id).filter(~Exists(same_name)).select_related('change'),
+            ('-valid_from', '-id'), limit, cursor,
+        )
         
         result = []
         
-        # Всегда добавляем текущее состояние группы
-        current_members = Person.objects.filter(group_id=group_id)
-        current_member_names = set()
-        
-        for member in current_members:
+        # Текущий состав группы отдаётся только на первой странице
+        for member in ([] if cursor else current_members.select_related('change')):
             # Формируем полное имя для текущего члена
             member_name_parts = [member.last_name, member.first_name]
             if member.middle_name:
                 member_name_parts.append(member.middle_name)
             member_full_name = " ".join(member_name_parts)
-            current_member_names.add(member_full_name)
             
             # Добавляем текущего члена как "действующую" запись
             from django.utils import timezone
@@ -249,7 +553,6 @@ def api_group_history_simple(request, group_id):
                 'is_current': True  # Флаг для отличия от исторических записей
             })
         
-        # Добавляем исторические записи только для людей, которых нет в текущем составе
         for record in history:
             # Формируем полное имя из компонентов
             name_parts = [record.last_name, record.first_name]
@@ -257,24 +560,25 @@ def api_group_history_simple(request, group_id):
                 name_parts.append(record.middle_name)
             full_name = " ".join(name_parts)
             
-            # Добавляем только если этого человека нет в текущем составе
-            if full_name not in current_member_names:
-                result.append({
-                    'timestamp': record.change.authored_at.isoformat() if record.change else record.valid_from.isoformat(),
-                    'author': record.change.author if record.change else 'System',
-                    'reason': record.change.reason if record.change else 'History record',
-                    'name': full_name,
-                    'valid_from': record.valid_from.isoformat(),
-                    'valid_to': record.valid_to.isoformat()
-                })
+            result.append({
+                'timestamp': record.change.authored_at.isoformat() if record.change else record.valid_from.isoformat(),
+                'author': record.change.author if record.change else 'System',
+                'reason': record.change.reason if record.change else 'History record',
+                'name': full_name,
+                'valid_from': record.valid_from.isoformat(),
+                'valid_to': record.valid_to.isoformat()
+            })
 
         # Сортируем результат по времени (новые сначала)
         result.sort(key=lambda x: x['timestamp'], reverse=True)
 
         return JsonResponse({
             'status': 'success',
-            'history': result
+            'history': result,
+            'next_cursor': next_cursor
         })
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
@@ -294,13 +598,10 @@ def api_group_at_time(request, group_id):
         from datetime import datetime
         from django.utils import timezone as django_timezone
         timestamp = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
+        group_id = resolve_group_id(group_id)
         
         # Сначала ищем в истории
-        history_record = PersonHistory.objects.select_related('change').filter(
-            group_id=group_id,
-            valid_from__lte=timestamp,
-            valid_to__gt=timestamp
-        ).first()
+        history_record = PersonHistory.valid_at(group_id, timestamp).select_related('change').first()
         
         if history_record:
             # Найдена историческая запись
@@ -0,0 +1,81 @@
+from django.db import connection
+from typing import Iterable, List
+
+from .models import GroupVitrine
+
+
+class VitrineService:
+    """Поддержка таблицы group_vitrine (одна строка на группу, последняя версия).
+
+    Обычная запись версии обновляет витрину в своём CTE (PersonService.write_person_version).
+    Здесь — пересчёт витрины из person для путей, меняющих группы пачками:
+    слияния, массовая загрузка, передедупликация.
+    """
+
+    @staticmethod
+    def columns() -> List[str]:
+        """Столбцы витрины, копируемые из person (кроме ключевых)"""
+        return [
+            f.column for f in GroupVitrine._meta.concrete_fields
+            if f.attname not in ('group_id', 'person_id', 'change_id')
+        ]
+
+    @staticmethod
+    def upsert_sql(source: str) -> str:
+        """INSERT ... ON CONFLICT в витрину из source — запроса, возвращающего строки person.
+
+        Строка витрины заменяется только более новой версией, поэтому
+        параллельные записи в одну группу не откатывают её назад.
+        """
+        columns = VitrineService.columns()
+        updates = ', '.join(f'{c} = EXCLUDED.{c}' for c in ['person_id', 'change_id'] + columns)
+        return f"""
+            INSERT INTO group_vitrine (group_id, person_id, change_id, {', '.join(columns)})
+            SELECT src.group_id, src.id, src.change_id, {', '.join('src.' + c for c in columns)}
+            FROM ({source}) src
+            ON CONFLICT (group_id) DO UPDATE SET {updates}
+            WHERE (group_vitrine.created_at, group_vitrine.person_id) <= (EXCLUDED.created_at, EXCLUDED.person_id)
+        """
+
+    @staticmethod
+    def latest_sql(condition: str) -> str:
+        """Последняя версия каждой группы из person, отобранной условием condition"""
+        return f"""
+            SELECT DISTINCT ON (p.group_id) p.*
+            FROM person p
+            WHERE {condition}
+            ORDER BY p.group_id, p.created_at DESC, p.id DESC
+        """
+
+    @staticmethod
+    def refresh_groups_sql(groups_sql: str, params: list):
+        """Пересчитать строки витрины для групп из подзапроса groups_sql.
+
+        Строки групп, в которых не осталось людей, из витрины удаляются.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM group_vitrine WHERE group_id IN ({groups_sql})", params)
+            cursor.execute(
+                VitrineService.upsert_sql(VitrineService.latest_sql(f"p.group_id IN ({groups_sql})")),
+                params,
+            )
+
+    @staticmethod
+    def refresh_groups(group_ids: Iterable[int]):
+        """Пересчитать строки витрины для перечисленных групп"""
+        group_ids = sorted({group_id for group_id in group_ids if group_id is not None})
+        if group_ids:
+            VitrineService.refresh_groups_sql("SELECT unnest(%s::int[])", [group_ids])
+
+    @staticmethod
+    def refresh_change(change_id: int):
+        """Пересчитать строки витрины для групп, в которые писал набор изменений"""
+        VitrineService.refresh_groups_sql("SELECT group_id FROM person WHERE change_id = %s", [change_id])
+
+    @staticmethod
+    def rebuild() -> int:
+        """Полная пересборка витрины из person. Возвращает число строк"""
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM group_vitrine")
+            cursor.execute(VitrineService.upsert_sql(VitrineService.latest_sql("p.group_id IS NOT NULL")))
+            return cursor.rowcount
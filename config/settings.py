@@ -18,6 +18,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'corsheaders',
     'apps.persons',
@@ -138,3 +139,34 @@ LOGGING = {
 # DaData API настройки
 DADATA_TOKEN = config('DADATA_TOKEN', default='')
 DADATA_SECRET = config('DADATA_SECRET', default='')
+
+# Дедупликация: внутрипроцессный индекс блокирующих ключей
+PERSONS_DEDUP_INDEX = config('PERSONS_DEDUP_INDEX', default=False, cast=bool)
+# Сколько последних наборов изменений перечитывать при догрузке индекса
+PERSONS_DEDUP_INDEX_OVERLAP = config('PERSONS_DEDUP_INDEX_OVERLAP', default=100, cast=int)
+# Минимальный интервал между догрузками (сек), догрузка — одна на пачку записей; 0 — перед каждой пачкой.
+# С PERSONS_DEDUP_LOCKING индекс догружается перед каждой пачкой независимо от интервала
+PERSONS_DEDUP_INDEX_REFRESH = config('PERSONS_DEDUP_INDEX_REFRESH', default=1.0, cast=float)
+# Advisory-блокировки Postgres по ключу блокировки на время «поиск группы + вставка»
+PERSONS_DEDUP_LOCKING = config('PERSONS_DEDUP_LOCKING', default=False, cast=bool)
+# Асинхронное создание людей: POST /api/persons/ отвечает 202 с квитанцией
+PERSONS_ASYNC_INGEST = config('PERSONS_ASYNC_INGEST', default=False, cast=bool)
+# Минимальный интервал (сек) между догрузками таблицы слитых групп в воркере
+PERSONS_GROUP_ALIAS_REFRESH = config('PERSONS_GROUP_ALIAS_REFRESH', default=1.0, cast=float)
+# Idempotency-Key: размер LRU в памяти воркера и срок жизни ключа (сек)
+PERSONS_IDEMPOTENCY_CACHE_SIZE = config('PERSONS_IDEMPOTENCY_CACHE_SIZE', default=10000, cast=int)
+PERSONS_IDEMPOTENCY_TTL = config('PERSONS_IDEMPOTENCY_TTL', default=86400, cast=int)
+# Кэш результатов поиска: размер LRU в воркере (0 — выключен), интервал проверки версии данных (сек),
+# необязательный общий уровень — алиас из CACHES (например, DatabaseCache или FileBasedCache) и его TTL (сек)
+PERSONS_SEARCH_CACHE_SIZE = config('PERSONS_SEARCH_CACHE_SIZE', default=1000, cast=int)
+PERSONS_SEARCH_CACHE_VERSION_CHECK = config('PERSONS_SEARCH_CACHE_VERSION_CHECK', default=1.0, cast=float)
+PERSONS_SEARCH_CACHE_SHARED = config('PERSONS_SEARCH_CACHE_SHARED', default='')
+PERSONS_SEARCH_CACHE_TIMEOUT = config('PERSONS_SEARCH_CACHE_TIMEOUT', default=300, cast=int)
+# Быстрая сериализация (values_list + orjson, без DRF) для перечисленных endpoint'ов:
+# search, list, as_of, group_history; параметр ?serializer=fast|default переопределяет настройку
+PERSONS_FAST_JSON_ENDPOINTS = config('PERSONS_FAST_JSON_ENDPOINTS', default='', cast=lambda v: [s.strip() for s in v.split(',') if s.strip()])
+# Контрольные точки состояния (manage.py checkpoints): не чаще чем раз в N наборов изменений,
+# отставание от текущего момента (сек) и сколько последних точек хранить
+PERSONS_CHECKPOINT_EVERY = config('PERSONS_CHECKPOINT_EVERY', default=1000, cast=int)
+PERSONS_CHECKPOINT_LAG = config('PERSONS_CHECKPOINT_LAG', default=300.0, cast=float)
+PERSONS_CHECKPOINT_KEEP = config('PERSONS_CHECKPOINT_KEEP', default=10, cast=int)
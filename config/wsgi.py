@@ -5,3 +5,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_wsgi_application()
+
+# Прогрев индекса дедупликации при старте воркера (если включён)
+from apps.persons.dedup_index import get_dedup_index  # noqa: E402
+
+_dedup_index = get_dedup_index()
+if _dedup_index is not None:
+    _dedup_index.warm_up()
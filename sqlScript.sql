@@ -79,30 +79,212 @@ WHERE is_current = true;
 
 -- текущее состояние и связь с группой
 CREATE INDEX IF NOT EXISTS i_person_current ON person(is_current) WHERE is_current;
-CREATE INDEX IF NOT EXISTS i_person_group   ON person(group_id);
+-- (group_id, id) - ещё и ключ курсорной пагинации поиска
+DROP INDEX IF EXISTS i_person_group;
+CREATE INDEX IF NOT EXISTS i_person_group_id ON person(group_id, id);
+-- курсорная пагинация списка (новые сначала)
+CREATE INDEX IF NOT EXISTS i_person_created ON person(created_at DESC, id DESC);
+-- догрузка индекса дедупликации по отметке последнего набора изменений
+CREATE INDEX IF NOT EXISTS i_person_change  ON person(change_id);
+
+-- поколение индекса дедупликации воркеров: увеличивается, когда группы переписаны целиком,
+-- воркеры тогда перестраивают индекс
+CREATE TABLE IF NOT EXISTS dedup_index_generation (
+  id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+  generation BIGINT NOT NULL DEFAULT 0
+);
+INSERT INTO dedup_index_generation DEFAULT VALUES ON CONFLICT DO NOTHING;
 
 -- для поиска (по установленным правилам)
 CREATE INDEX IF NOT EXISTS i_person_match
   ON person (gender, first_name, COALESCE(middle_name,''), last_name)
   WHERE is_current;
 
--- быстрый поиск по контактам (точное совпадение)
-CREATE INDEX IF NOT EXISTS i_person_phone  ON person(phone)  WHERE is_current;
-CREATE INDEX IF NOT EXISTS i_person_email  ON person(email)  WHERE is_current;
+-- нормализованные ключи контактов (заполняет бэкенд, для старых строк: manage.py refresh_search_keys)
+ALTER TABLE person
+  ADD COLUMN IF NOT EXISTS phone_key VARCHAR(20),
+  ADD COLUMN IF NOT EXISTS email_key VARCHAR(255),
+  ADD COLUMN IF NOT EXISTS address_key TEXT;
+
+-- фонетические ключи фамилии и имени (russian_metaphone, заполняет бэкенд, для старых строк: manage.py refresh_search_keys)
+ALTER TABLE person
+  ADD COLUMN IF NOT EXISTS last_name_phonetic VARCHAR(100),
+  ADD COLUMN IF NOT EXISTS first_name_phonetic VARCHAR(100);
+
+-- быстрый поиск по контактам (точное совпадение ключа + ключ блокировки, index-only)
+DROP INDEX IF EXISTS i_person_phone;
+DROP INDEX IF EXISTS i_person_email;
+CREATE INDEX IF NOT EXISTS i_person_phone_key
+  ON person (phone_key, gender, first_name, middle_name) INCLUDE (last_name, group_id);
+CREATE INDEX IF NOT EXISTS i_person_email_key
+  ON person (email_key, gender, first_name, middle_name) INCLUDE (last_name, group_id);
+CREATE INDEX IF NOT EXISTS i_person_address_key
+  ON person (address_key, gender, first_name, middle_name) INCLUDE (last_name, group_id);
 
 -- для истории (диапазоны)
 CREATE INDEX IF NOT EXISTS i_hist_group_from_to ON person_history (group_id, valid_from, valid_to);
 
+-- запросы «на момент времени»: validity @> ts — одна проба GiST по (group_id, validity)
+-- вместо просмотра всех версий с valid_from <= ts. Версии одной группы могут перекрываться
+-- (слияние групп переносит историю обеих в целевую), поэтому EXCLUDE-ограничения нет.
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+ALTER TABLE person_history
+  ADD COLUMN IF NOT EXISTS validity tstzrange
+    GENERATED ALWAYS AS (tstzrange(valid_from, GREATEST(valid_from, valid_to), '[)')) STORED;
+CREATE INDEX IF NOT EXISTS i_hist_group_validity ON person_history USING gist (group_id, validity);
+
+-- последняя версия группы на момент времени в person
+CREATE INDEX IF NOT EXISTS i_person_group_created ON person (group_id, created_at DESC, id DESC);
+
+-- слитые группы (запись «моста» между несколькими группами объединяет их)
+CREATE TABLE IF NOT EXISTS person_group_alias (
+  group_id INT PRIMARY KEY REFERENCES person_group(id),
+  target_id INT NOT NULL REFERENCES person_group(id),
+  change_id BIGINT REFERENCES change_set(id)
+);
+
+CREATE INDEX IF NOT EXISTS i_group_alias_change ON person_group_alias(change_id);
+-- старые id по актуальному (строки контрольных точек для списка групп, перенос алиасов при слиянии)
+CREATE INDEX IF NOT EXISTS i_group_alias_target ON person_group_alias(target_id);
+
+-- очередь асинхронного создания людей (квитанции 202)
+CREATE TABLE IF NOT EXISTS person_ingest_queue (
+  id BIGSERIAL PRIMARY KEY,
+  payload JSONB NOT NULL,
+  status VARCHAR(16) NOT NULL DEFAULT 'pending' CHECK (status IN ('pending','done','failed')),
+  enqueued_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  processed_at TIMESTAMPTZ,
+  person_id INT REFERENCES person(id) ON DELETE SET NULL,
+  group_id INT REFERENCES person_group(id) ON DELETE SET NULL,
+  error TEXT
+);
+
+-- воркер выбирает только ожидающие квитанции (FOR UPDATE SKIP LOCKED)
+CREATE INDEX IF NOT EXISTS i_ingest_pending ON person_ingest_queue(id) WHERE status = 'pending';
+
+-- ответы на повторные запросы с заголовком Idempotency-Key
+CREATE TABLE IF NOT EXISTS idempotency_key (
+  key VARCHAR(255) PRIMARY KEY,
+  status_code INT,
+  response JSONB,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  expires_at TIMESTAMPTZ NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS i_idempotency_expires ON idempotency_key(expires_at);
+
+-- контрольные точки состояния: последняя версия каждой группы в person на момент taken_at
+-- (manage.py checkpoints). Запрос «на момент T» берёт ближайшую точку и досматривает только
+-- версии, созданные после неё. invalidated_at — точка устарела (передедупликация, правка в админке)
+CREATE TABLE IF NOT EXISTS state_checkpoint (
+  id BIGSERIAL PRIMARY KEY,
+  change_id BIGINT NOT NULL REFERENCES change_set(id),
+  taken_at TIMESTAMPTZ NOT NULL,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  group_count INT NOT NULL DEFAULT 0,
+  invalidated_at TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS i_checkpoint_taken ON state_checkpoint (taken_at DESC) WHERE invalidated_at IS NULL;
+
+CREATE TABLE IF NOT EXISTS state_checkpoint_row (
+  checkpoint_id BIGINT NOT NULL REFERENCES state_checkpoint(id) ON DELETE CASCADE,
+  group_id INT NOT NULL,
+  person_id INT NOT NULL,
+  version_at TIMESTAMPTZ NOT NULL,
+
+  last_name  VARCHAR(100) NOT NULL,
+  first_name VARCHAR(100) NOT NULL,
+  middle_name VARCHAR(100),
+  birth_date DATE NOT NULL,
+  gender CHAR(1) NOT NULL,
+  address TEXT NOT NULL,
+  phone VARCHAR(20),
+  email VARCHAR(255),
+
+  PRIMARY KEY (checkpoint_id, group_id)
+);
+
+--Версия данных для кэша поиска
+-- счётчик увеличивается в транзакции каждой записи; строк несколько, чтобы параллельные
+-- транзакции не ждали блокировку одной строки: версия = сумма по всем слотам
+CREATE TABLE IF NOT EXISTS search_data_version (
+  slot SMALLINT PRIMARY KEY,
+  version BIGINT NOT NULL DEFAULT 0
+);
+INSERT INTO search_data_version (slot) SELECT generate_series(0, 15) ON CONFLICT DO NOTHING;
+
 --Реализация витрины
+-- одна строка на группу с последней версией человека (обновляется бэкендом в транзакции записи)
+CREATE TABLE IF NOT EXISTS group_vitrine (
+  group_id INT PRIMARY KEY REFERENCES person_group(id),
+  person_id INT NOT NULL REFERENCES person(id),
+  change_id BIGINT REFERENCES change_set(id),
+
+  last_name  VARCHAR(100) NOT NULL,
+  first_name VARCHAR(100) NOT NULL,
+  middle_name VARCHAR(100),
+  birth_date DATE NOT NULL,
+  gender CHAR(1) NOT NULL,
+  address TEXT NOT NULL,
+  phone VARCHAR(20),
+  email VARCHAR(255),
+
+  phone_key VARCHAR(20),
+  email_key VARCHAR(255),
+  address_key TEXT,
+  last_name_phonetic VARCHAR(100),
+  first_name_phonetic VARCHAR(100),
+
+  created_at TIMESTAMPTZ NOT NULL,
+
+  -- полнотекстовый поиск по адресу (параметр q), пересчитывается при каждой записи строки
+  -- (по нормализованному ключу: ё и пунктуация не мешают совпадению)
+  address_tsv tsvector
+    GENERATED ALWAYS AS (to_tsvector('russian'::regconfig, coalesce(address_key, address))) STORED
+);
+
+-- подстрочный поиск витрины (col ILIKE '%x%' / key LIKE '%x%') по триграммам
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS i_vitrine_last_name_trgm   ON group_vitrine USING gin (last_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS i_vitrine_first_name_trgm  ON group_vitrine USING gin (first_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS i_vitrine_middle_name_trgm ON group_vitrine USING gin (middle_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS i_vitrine_address_key_trgm ON group_vitrine USING gin (address_key gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS i_vitrine_email_key_trgm   ON group_vitrine USING gin (email_key gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS i_vitrine_address_tsv      ON group_vitrine USING gin (address_tsv);
+-- телефон (phone_key — только цифры): точное совпадение и начало номера по pattern_ops,
+-- конец номера («последние 4 цифры») — по индексу перевёрнутого ключа
+CREATE INDEX IF NOT EXISTS i_vitrine_phone_prefix     ON group_vitrine (phone_key varchar_pattern_ops);
+CREATE INDEX IF NOT EXISTS i_vitrine_phone_suffix     ON group_vitrine (reverse(phone_key) text_pattern_ops);
+
+-- фонетический поиск ФИО (phonetic=true): равенство ключей вместо нечёткого просмотра
+ALTER TABLE group_vitrine
+  ADD COLUMN IF NOT EXISTS last_name_phonetic VARCHAR(100),
+  ADD COLUMN IF NOT EXISTS first_name_phonetic VARCHAR(100);
+CREATE INDEX IF NOT EXISTS i_vitrine_name_phonetic       ON group_vitrine (last_name_phonetic, first_name_phonetic);
+CREATE INDEX IF NOT EXISTS i_vitrine_first_name_phonetic ON group_vitrine (first_name_phonetic);
+
+-- первичное заполнение (только пустой витрины, полная пересборка: manage.py rebuild_vitrine)
+INSERT INTO group_vitrine (group_id, person_id, change_id, last_name, first_name, middle_name, birth_date,
+                           gender, address, phone, email, phone_key, email_key, address_key,
+                           last_name_phonetic, first_name_phonetic, created_at)
+SELECT DISTINCT ON (p.group_id)
+       p.group_id, p.id, p.change_id, p.last_name, p.first_name, p.middle_name, p.birth_date,
+       p.gender, p.address, p.phone, p.email, p.phone_key, p.email_key, p.address_key,
+       p.last_name_phonetic, p.first_name_phonetic, p.created_at
+FROM person p
+WHERE p.group_id IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM group_vitrine)
+ORDER BY p.group_id, p.created_at DESC, p.id DESC;
+
 CREATE OR REPLACE VIEW person_vitrine AS
 SELECT
-  p.group_id,
-  p.last_name, p.first_name, p.middle_name,
-  p.birth_date, p.gender,
-  p.address, p.phone, p.email,
-  p.created_at, p.change_id
-FROM person p
-WHERE p.is_current = true;
+  v.group_id,
+  v.last_name, v.first_name, v.middle_name,
+  v.birth_date, v.gender,
+  v.address, v.phone, v.email,
+  v.created_at, v.change_id
+FROM group_vitrine v;
 
 -- дедупликация
 DROP TRIGGER IF EXISTS trg_assign_person_group ON person;